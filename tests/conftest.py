@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,23 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def sync_thumbnails(settings):
+    # Тесты с transaction=True доходят до on_commit: без пула миниатюры
+    # готовятся сразу и не пишут в MEDIA_ROOT после конца теста.
+    settings.THUMBNAIL_WORKERS = 0
+    yield
+    from posts import thumbnails
+    thumbnails.shutdown()
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_cache(tmp_path_factory):
+    # Общий кэш живёт в файле и пережил бы тестовую базу.
+    from django.test import override_settings
+    from core.test_runner import isolated_caches
+    directory = str(tmp_path_factory.mktemp('cache'))
+    with override_settings(CACHES=isolated_caches(directory)):
+        yield
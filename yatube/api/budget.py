@@ -0,0 +1,37 @@
+import logging
+from functools import wraps
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+def query_budget(limit):
+    """Считает запросы к базе за вызов view и жалуется, если их больше limit.
+
+    Бюджет — обещание эндпоинта не делать N+1: превышение пишется в лог
+    с путём запроса, а ответ отдаётся как обычно.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # Сессия и пользователь читаются лениво; в бюджет эндпоинта
+            # они не входят.
+            request.user.is_authenticated
+            queries = []
+
+            def count(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count):
+                response = view(request, *args, **kwargs)
+            if len(queries) > limit:
+                logger.warning(
+                    '%s: %s queries, budget %s',
+                    request.get_full_path(), len(queries), limit,
+                )
+            return response
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
@@ -0,0 +1,167 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from api import views
+from posts import thumbnails
+from posts.models import Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ApiViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.ALL_POSTS: int = settings.API_PAGE_SIZE + 5
+        for number in range(cls.ALL_POSTS):
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+        cls.post = Post.objects.create(
+            text='С картинкой', author=cls.author, group=cls.group,
+            image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        thumbnails.generate(cls.post.pk)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = [
+            reverse('api:post_list'),
+            reverse('api:post_detail', args=(self.post.pk,)),
+            reverse('api:group_detail', args=(self.group.slug,)),
+            reverse('api:group_posts', args=(self.group.slug,)),
+            reverse('api:profile_detail', args=(self.author.username,)),
+            reverse('api:profile_posts', args=(self.author.username,)),
+        ]
+
+    def test_query_budgets(self):
+        """Каждый эндпоинт укладывается в свой бюджет запросов"""
+        for user in (None, self.author):
+            if user is not None:
+                self.client.force_login(user)
+            for url in self.urls + [self.urls[0] + '?fields=id']:
+                with self.subTest(url=url, user=user):
+                    cache.clear()
+                    with mock.patch('api.budget.logger') as logger:
+                        response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    logger.warning.assert_not_called()
+
+    def test_cursor_pagination(self):
+        """Страницы идут по курсору next без повторов и пропусков"""
+        data = self.client.get(reverse('api:post_list')).json()
+        self.assertEqual(len(data['results']), settings.API_PAGE_SIZE)
+        self.assertIsNone(data['previous'])
+        rest = self.client.get(data['next']).json()
+        ids = [post['id'] for post in data['results'] + rest['results']]
+        self.assertEqual(len(set(ids)), self.ALL_POSTS + 1)
+        self.assertIsNone(rest['next'])
+        back = self.client.get(rest['previous']).json()
+        self.assertEqual(back['results'], data['results'])
+
+    def test_sparse_fieldsets(self):
+        """?fields оставляет в ответе только запрошенные поля"""
+        url = reverse('api:post_list')
+        data = self.client.get(url, {'fields': 'id,author'}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'author'})
+        self.assertEqual(
+            data['results'][0]['author'],
+            {'username': 'author', 'name': 'Лев Толстой'},
+        )
+        self.assertIn('fields=id%2Cauthor', data['next'])
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url, {'fields': 'id'})
+        self.assertLessEqual(len(context), views.post_list.query_budget)
+        page = [
+            query['sql'] for query in context
+            if 'LIMIT' in query['sql'] and '"posts_post"' in query['sql']
+        ]
+        self.assertEqual(len(page), 1)
+        self.assertNotIn('"text"', page[0])
+        self.assertNotIn('"auth_user"', page[0])
+
+    def test_unknown_field(self):
+        """Неизвестное поле — 400 с описанием"""
+        response = self.client.get(
+            reverse('api:post_list'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['detail'])
+
+    def test_not_found_is_json(self):
+        """404 у API — JSON, а не HTML-страница"""
+        response = self.client.get(
+            reverse('api:profile_detail', args=('nobody',))
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'Не найдено.'})
+
+    def test_thumbnail_urls(self):
+        """У поста с картинкой в ответе готовые миниатюры"""
+        data = self.client.get(
+            reverse('api:post_detail', args=(self.post.pk,))
+        ).json()
+        self.assertEqual(data['image']['url'], self.post.image.url)
+        self.assertEqual(
+            set(data['image']['thumbnails']), set(thumbnails.geometries())
+        )
+        self.assertEqual(data['group']['slug'], self.group.slug)
+
+    def test_profile(self):
+        """Профиль отдаёт счётчики из статистики автора"""
+        data = self.client.get(
+            reverse('api:profile_detail', args=(self.author.username,))
+        ).json()
+        self.assertEqual(data['posts_count'], self.ALL_POSTS + 1)
+        self.assertEqual(data['name'], 'Лев Толстой')
+
+    def test_conditional_get(self):
+        """Повторный запрос с ETag получает 304"""
+        url = reverse('api:post_list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_over_budget_logged(self):
+        """Превышение бюджета пишется в лог"""
+        from api.budget import query_budget
+
+        @query_budget(0)
+        def view(request):
+            return list(Post.objects.all()[:1])
+
+        request = self.client.get(reverse('api:post_list')).wsgi_request
+        with self.assertLogs('api.budget', level='WARNING'):
+            view(request)
@@ -0,0 +1,243 @@
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_safe
+from posts import caching, thumbnails
+from posts.models import Group, Post, User
+from posts.paginator import CursorPaginator
+
+from .budget import query_budget
+
+# Поле ответа -> колонки, которые для него нужно прочитать. Ключ
+# пагинации (pub_date, id) читается всегда.
+POST_FIELDS = {
+    'id': (),
+    'text': ('text',),
+    'pub_date': (),
+    'author': ('author', 'author__username', 'author__first_name',
+               'author__last_name'),
+    'group': ('group', 'group__slug', 'group__title'),
+    'image': ('image',),
+    'comments_count': ('comments_count',),
+}
+GROUP_FIELDS = ('slug', 'title', 'description')
+PROFILE_FIELDS = (
+    'username', 'name', 'posts_count', 'followers_count', 'following_count',
+)
+
+
+class ApiPaginator(CursorPaginator):
+    """Клиенту нужны только соседние страницы, без окна ссылок."""
+
+    window: int = 0
+
+
+def respond(data, status=200):
+    # Кириллица без \uXXXX почти втрое короче.
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def json_errors(view):
+    """404 и ошибки в параметрах отдаются JSON, а не HTML-страницей."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return respond({'detail': 'Не найдено.'}, status=404)
+        except ValidationError as error:
+            return respond({'detail': ' '.join(error.messages)}, status=400)
+    return wrapper
+
+
+def requested_fields(request, allowed):
+    """Поля из ?fields=a,b (sparse fieldsets); без параметра — все."""
+    names = [name for name in request.GET.get('fields', '').split(',')
+             if name]
+    if not names:
+        return list(allowed)
+    unknown = sorted(set(names) - set(allowed))
+    if unknown:
+        raise ValidationError(
+            'Неизвестные поля: %(fields)s. Доступны: %(allowed)s.',
+            params={
+                'fields': ', '.join(unknown),
+                'allowed': ', '.join(allowed),
+            },
+        )
+    return names
+
+
+def post_queryset(queryset, fields):
+    """Читает только колонки и связи, нужные запрошенным полям."""
+    related = [name for name in ('author', 'group') if name in fields]
+    columns = ['pub_date']
+    for name in fields:
+        columns.extend(POST_FIELDS[name])
+    if related:
+        # Пустой select_related() присоединил бы все связи, вплоть до
+        # пароля автора.
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+def image_json(post):
+    if not post.image:
+        return None
+    return {
+        'url': post.image.url,
+        'thumbnails': {
+            name: {
+                'url': found.url,
+                'width': found.width,
+                'height': found.height,
+            }
+            for name, found in post.thumbnails.items()
+        },
+    }
+
+
+def post_json(post, fields):
+    values = {
+        'id': lambda: post.pk,
+        'text': lambda: post.text,
+        'pub_date': lambda: post.pub_date.isoformat(),
+        'author': lambda: {
+            'username': post.author.username,
+            'name': post.author.get_full_name(),
+        },
+        'group': lambda: post.group and {
+            'slug': post.group.slug,
+            'title': post.group.title,
+        },
+        'image': lambda: image_json(post),
+        'comments_count': lambda: post.comments_count,
+    }
+    return {name: values[name]() for name in fields}
+
+
+def group_json(group, fields):
+    return {name: getattr(group, name) for name in fields}
+
+
+def profile_json(profile, fields):
+    stats = getattr(profile, 'stats', None)
+    values = {
+        'username': profile.username,
+        'name': profile.get_full_name(),
+        'posts_count': stats.posts_count if stats else 0,
+        'followers_count': stats.followers_count if stats else 0,
+        'following_count': stats.following_count if stats else 0,
+    }
+    return {name: values[name] for name in fields}
+
+
+def page_link(request, name, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    query[name] = cursor
+    return f'{request.path}?{query.urlencode()}'
+
+
+def post_page(request, queryset, total=None):
+    """Страница постов с курсорами на соседние страницы."""
+    fields = requested_fields(request, POST_FIELDS)
+    page = ApiPaginator(
+        post_queryset(queryset, fields), settings.API_PAGE_SIZE,
+        total=total,
+    ).get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    posts = page.object_list
+    if 'image' in fields:
+        posts = thumbnails.attach(posts)
+    return respond({
+        'results': [post_json(post, fields) for post in posts],
+        'next': page_link(request, 'after', page.next_cursor),
+        'previous': page_link(request, 'before', page.previous_cursor),
+    })
+
+
+@query_budget(2)
+@require_safe
+@condition(etag_func=caching.index_etag)
+@caching.anonymous_page(caching.index_etag)
+@json_errors
+def post_list(request):
+    return post_page(request, Post.objects.all())
+
+
+@query_budget(3)
+@require_safe
+@condition(etag_func=caching.post_etag)
+@caching.anonymous_page(caching.post_etag)
+@json_errors
+def post_detail(request, post_id):
+    fields = requested_fields(request, POST_FIELDS)
+    post = get_object_or_404(
+        post_queryset(Post.objects.all(), fields), pk=post_id
+    )
+    if 'image' in fields:
+        thumbnails.attach([post])
+    return respond(post_json(post, fields))
+
+
+@query_budget(2)
+@require_safe
+@condition(etag_func=caching.group_etag)
+@caching.anonymous_page(caching.group_etag)
+@json_errors
+def group_detail(request, slug):
+    fields = requested_fields(request, GROUP_FIELDS)
+    group = get_object_or_404(Group.objects.only(*fields), slug=slug)
+    return respond(group_json(group, fields))
+
+
+@query_budget(4)
+@require_safe
+@condition(etag_func=caching.group_etag)
+@caching.anonymous_page(caching.group_etag)
+@json_errors
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return post_page(request, group.posts.all())
+
+
+@query_budget(2)
+@require_safe
+@condition(etag_func=caching.profile_etag)
+@caching.anonymous_page(caching.profile_etag)
+@json_errors
+def profile_detail(request, username):
+    fields = requested_fields(request, PROFILE_FIELDS)
+    profile = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    return respond(profile_json(profile, fields))
+
+
+@query_budget(4)
+@require_safe
+@condition(etag_func=caching.profile_etag)
+@caching.anonymous_page(caching.profile_etag)
+@json_errors
+def profile_posts(request, username):
+    profile = get_object_or_404(
+        User.objects.select_related('stats').only(
+            'pk', 'stats__posts_count'
+        ),
+        username=username,
+    )
+    stats = getattr(profile, 'stats', None)
+    return post_page(
+        request, profile.posts.all(), total=stats and stats.posts_count
+    )
@@ -0,0 +1,305 @@
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в SQLite-файле, общий для всех процессов на одной машине.
+
+    LOCATION — путь к файлу базы. Каждый поток держит своё соединение,
+    файл работает в режиме WAL, поэтому читатели не ждут писателей;
+    incr и add выполняются в транзакции BEGIN IMMEDIATE и атомарны
+    между процессами.
+    """
+
+    cull_every: int = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(
+                self.location, timeout=10, isolation_level=None,
+                check_same_thread=False,
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            db.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)'
+            )
+            self._local.db = db
+        return db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _alive(self, expires):
+        return expires is None or expires > time.time()
+
+    def get(self, key, default=None, version=None):
+        row = self._db.execute(
+            'SELECT value, expires FROM cache WHERE key = ?',
+            (self._key(key, version),),
+        ).fetchone()
+        if row is None or not self._alive(row[1]):
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        rows = self._db.execute(
+            'SELECT key, value, expires FROM cache WHERE key IN (%s)'
+            % ', '.join('?' * len(keys)),
+            list(keys),
+        )
+        return {
+            keys[key]: pickle.loads(value)
+            for key, value, expires in rows if self._alive(expires)
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        self._db.executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            [
+                (self._key(key, version),
+                 pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires)
+                for key, value in data.items()
+            ],
+        )
+        self._writes += 1
+        if self._writes % self.cull_every == 0:
+            self._cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()),
+            )
+            added = db.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                 self.get_backend_timeout(timeout)),
+            ).rowcount
+        return added == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or not self._alive(row[1]):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key),
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ?',
+            (self.get_backend_timeout(timeout), self._key(key, version)),
+        ).rowcount == 1
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version) is not _MISSING
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        self._db.executemany(
+            'DELETE FROM cache WHERE key = ?',
+            [(self._key(key, version),) for key in keys],
+        )
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединения живут всё время работы потока, как и у LocMemCache.
+        pass
+
+    def _transaction(self):
+        return _Immediate(self._db)
+
+    def _cull(self):
+        db = self._db
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        total = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if total > self._max_entries and self._cull_frequency:
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (total // self._cull_frequency,),
+            )
+
+
+class _Immediate:
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кэш: LRU в памяти процесса перед общим кэшем.
+
+    OPTIONS: SHARED — алиас общего кэша из CACHES, LOCAL_MAX_ENTRIES —
+    размер локального LRU, LOCAL_TIMEOUT — сколько секунд процесс может
+    отдавать локальную копию, не спрашивая общий кэш. Запись идёт сразу
+    в оба уровня, поэтому свои изменения процесс видит сразу, а чужие —
+    не позже чем через LOCAL_TIMEOUT.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self.local_timeout = float(options.get('LOCAL_TIMEOUT', 5))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _local_key(self, key, version):
+        return self.shared.make_key(key, version=version)
+
+    def _remember(self, key, value, version):
+        local_key = self._local_key(key, version)
+        with self._lock:
+            self._entries[local_key] = (
+                time.monotonic() + self.local_timeout,
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            )
+            self._entries.move_to_end(local_key)
+            while len(self._entries) > self.local_max_entries:
+                self._entries.popitem(last=False)
+
+    def _recall(self, key, version):
+        local_key = self._local_key(key, version)
+        with self._lock:
+            expires, value = self._entries.get(local_key, (0, _MISSING))
+            if expires > time.monotonic():
+                self._entries.move_to_end(local_key)
+                return pickle.loads(value)
+            self._entries.pop(local_key, None)
+        return _MISSING
+
+    def _forget(self, keys, version):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(self._local_key(key, version), None)
+
+    def get(self, key, default=None, version=None):
+        value = self._recall(key, version)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING, version=version)
+            if value is _MISSING:
+                return default
+            self._remember(key, value, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found, missing = {}, []
+        for key in keys:
+            value = self._recall(key, version)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            fetched = self.shared.get_many(missing, version=version)
+            for key, value in fetched.items():
+                self._remember(key, value, version)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, self._timeout(timeout), version=version)
+        self._remember(key, value, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(
+            data, self._timeout(timeout), version=version
+        )
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(key, value, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(
+            key, value, self._timeout(timeout), version=version
+        )
+        if added:
+            self._remember(key, value, version)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self._remember(key, value, version)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, self._timeout(timeout), version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version) is not _MISSING
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version=version)
+        self._forget([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version=version)
+        self._forget(keys, version)
+
+    def clear(self):
+        self.shared.clear()
+        with self._lock:
+            self._entries.clear()
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
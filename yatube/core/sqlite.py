@@ -0,0 +1,10 @@
+from django.conf import settings
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Настраивает каждое новое соединение с SQLite из SQLITE_PRAGMAS."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,41 @@
+import copy
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+def isolated_caches(directory):
+    """CACHES проекта, но общий кэш — пустой SQLite-файл в directory.
+
+    Общий кэш переживает процессы, а тестовая база — нет: записи прошлых
+    запусков (версии, хранилище sorl) выдавали бы чужие данные за свои.
+    """
+    caches = copy.deepcopy(settings.CACHES)
+    if 'shared' in caches:
+        caches['shared'] = {
+            'BACKEND': 'core.cache_backends.SQLiteCache',
+            'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    return caches
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты работают с отдельным общим кэшем, который удаляется после."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp()
+        self.caches = override_settings(
+            CACHES=isolated_caches(self.cache_dir)
+        )
+        self.caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
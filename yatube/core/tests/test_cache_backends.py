@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from core.cache_backends import SQLiteCache, TieredCache
+
+TEMP_CACHE_DIR = tempfile.mkdtemp()
+CACHE_PATH = os.path.join(TEMP_CACHE_DIR, 'cache.sqlite3')
+
+
+def increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': CACHE_PATH,
+    },
+})
+class SharedCacheTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        caches['shared'].clear()
+
+    def test_sqlite_cache_operations(self):
+        """SQLite-кэш поддерживает основные операции Django-кэша"""
+        cache = caches['shared']
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 'other'))
+        self.assertTrue(cache.add('new', 'value'))
+        self.assertTrue(cache.add('counter', 1))
+        self.assertEqual(cache.incr('counter', 5), 6)
+        self.assertEqual(
+            cache.get_many(['key', 'new', 'absent']),
+            {'key': {'value': 1}, 'new': 'value'},
+        )
+        cache.set('short', 'value', 0.05)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('short'))
+        self.assertTrue(cache.add('short', 'again'))
+        cache.delete('key')
+        self.assertFalse(cache.has_key('key'))
+        with self.assertRaises(ValueError):
+            cache.incr('absent')
+
+    def test_sqlite_cache_is_shared_between_processes(self):
+        """Счётчик атомарно растёт при записи из нескольких процессов"""
+        caches['shared'].set('counter', 0, None)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(CACHE_PATH, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(caches['shared'].get('counter'), 200)
+
+    def test_tiered_cache(self):
+        """Локальный уровень отдаёт копию, пока не истёк LOCAL_TIMEOUT"""
+        first = TieredCache(None, {'OPTIONS': {'LOCAL_TIMEOUT': 60}})
+        second = TieredCache(None, {'OPTIONS': {'LOCAL_TIMEOUT': 60}})
+        fresh = TieredCache(None, {'OPTIONS': {'LOCAL_TIMEOUT': 0}})
+        first.set('key', 1)
+        self.assertEqual(second.get('key'), 1)
+        first.set('key', 2)
+        self.assertEqual(first.get('key'), 2)
+        self.assertEqual(second.get('key'), 1)
+        self.assertEqual(fresh.get('key'), 2)
+        self.assertEqual(first.incr('key'), 3)
+        self.assertEqual(fresh.get_many(['key', 'absent']), {'key': 3})
+        first.delete('key')
+        self.assertIsNone(first.get('key'))
+
+    def test_tiered_cache_lru(self):
+        """Локальный уровень ограничен LOCAL_MAX_ENTRIES"""
+        cache = TieredCache(None, {'OPTIONS': {'LOCAL_MAX_ENTRIES': 2}})
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        self.assertEqual(len(cache._entries), 2)
+        self.assertEqual(cache.get('a'), 'a')
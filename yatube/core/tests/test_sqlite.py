@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+
+from django.db import connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+TEMP_DB_DIR = tempfile.mkdtemp()
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 1024 * 1024,
+    'cache_size': -2048,
+    'busy_timeout': 3000,
+}
+
+
+class SQLitePragmaTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DB_DIR, ignore_errors=True)
+
+    def connect(self):
+        wrapper = DatabaseWrapper({
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(TEMP_DB_DIR, 'db.sqlite3'),
+        })
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS=PRAGMAS)
+    def test_new_connection_gets_pragmas(self):
+        """Каждое новое соединение получает PRAGMA из настроек"""
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        # NORMAL — это 1.
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'mmap_size'), 1024 * 1024)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -2048)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 3000)
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_default_profile_untouched(self):
+        """Без боевого режима SQLite работает с настройками по умолчанию"""
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 2)
+        self.assertEqual(self.pragma(wrapper, 'mmap_size'), 0)
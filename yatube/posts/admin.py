@@ -1,17 +1,85 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 
 from .models import Comment, Follow, Group, Post
+from .paginator import cached_count
+from .search import match_condition, to_match
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки с закэшированным числом строк.
+
+    Число может отставать на ADMIN_COUNT_TIMEOUT секунд, зато список не
+    пересчитывает всю таблицу на каждой странице и каждом фильтре.
+    """
+
+    @cached_property
+    def count(self):
+        count = cached_count(self.object_list, settings.ADMIN_COUNT_TIMEOUT)
+        return 0 if count is None else count
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Без второго COUNT(*) по всей таблице для «N из M».
+    show_full_result_count = False
+
+
+class FullTextAdmin(ScalableAdmin):
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по индексу FTS5 вместо LIKE по всей таблице."""
+        if connection.vendor != 'sqlite':
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        match = to_match(search_term)
+        if match:
+            condition, params = match_condition(match, self.model)
+            queryset = queryset.extra(where=[condition], params=params)
+        return queryset, False
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(FullTextAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
-    list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author', 'group')
     empty_value_display = '-пусто-'
 
 
-admin.site.register(Group)
-admin.site.register(Follow)
-admin.site.register(Comment)
+@admin.register(Group)
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug')
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+
+
+@admin.register(Comment)
+class CommentAdmin(FullTextAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    search_fields = ('text',)
+    date_hierarchy = 'created'
+    autocomplete_fields = ('author',)
+    raw_id_fields = ('post',)
+    readonly_fields = ('parent', 'path')
+
+    def get_readonly_fields(self, request, obj=None):
+        # Ветка держится на path: перенос комментария к другому посту или
+        # родителю не пересчитал бы пути его ответов.
+        if obj is not None:
+            return self.readonly_fields + ('post',)
+        return self.readonly_fields
+
+
+@admin.register(Follow)
+class FollowAdmin(ScalableAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
@@ -0,0 +1,200 @@
+import time
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.utils.translation import get_language
+
+from .models import Group, Post, User
+
+
+def _key(scope):
+    return f'version:{scope}'
+
+
+def _initial():
+    # Версия, созданная заново после вытеснения ключа, должна быть больше
+    # любой прежней, иначе старые фрагменты снова станут актуальными.
+    return time.time_ns() // 1000
+
+
+def versions(*scopes):
+    """Текущая версия содержимого для набора областей кэша."""
+    keys = [_key(scope) for scope in scopes]
+    known = cache.get_many(keys)
+    missing = {key: _initial() for key in keys if key not in known}
+    if missing:
+        cache.set_many(missing, settings.FEED_CACHE_TIMEOUT)
+        known.update(missing)
+    return '.'.join(str(known[key]) for key in keys)
+
+
+def bump(*scopes):
+    """Делает устаревшими все фрагменты, собранные для этих областей."""
+    for scope in scopes:
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.set(_key(scope), _initial(), settings.FEED_CACHE_TIMEOUT)
+
+
+def post_scopes(post_id, author_id, *group_ids):
+    scopes = ['index', f'post:{post_id}', f'profile:{author_id}']
+    scopes.extend(
+        f'group:{group_id}' for group_id in set(group_ids) if group_id
+    )
+    return scopes
+
+
+def fragment(*scopes):
+    """Контекст для {% cache cache_timeout ... cache_version %}."""
+    return {
+        'cache_version': versions(*scopes),
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+
+
+def etag(request, *scopes):
+    """ETag страницы: версии её областей, пользователь, сессия и адрес.
+
+    Считается без обращения к постам, поэтому ответ 304 не трогает ни
+    пагинатор, ни шаблоны.
+    """
+    parts = [
+        versions(*scopes), request.get_full_path(), get_language() or '',
+    ]
+    if request.user.is_authenticated:
+        # В страницах вошедшего пользователя есть формы с CSRF-токеном:
+        # после нового входа старая копия отправила бы устаревший.
+        # get_token заводит токен сразу, чтобы ETag первого ответа
+        # совпал со следующим.
+        get_token(request)
+        parts += [
+            str(request.user.pk),
+            request.session.session_key or '',
+            request.META.get('CSRF_COOKIE') or '',
+        ]
+    else:
+        parts.append('anon')
+    raw = '|'.join(parts)
+    return f'"{md5(raw.encode()).hexdigest()}"'
+
+
+def shared_etag(request, *scopes):
+    """ETag ответа, одинакового для всех: без пользователя и языка."""
+    raw = '|'.join((versions(*scopes), request.get_full_path()))
+    return f'"{md5(raw.encode()).hexdigest()}"'
+
+
+def once_per_request(etag_func):
+    """ETag нужен и condition, и anonymous_page: считаем его один раз."""
+    @wraps(etag_func)
+    def wrapper(request, *args, **kwargs):
+        known = request.__dict__.setdefault('_page_etags', {})
+        if etag_func.__name__ not in known:
+            known[etag_func.__name__] = etag_func(request, *args, **kwargs)
+        return known[etag_func.__name__]
+    return wrapper
+
+
+def anonymous_page(etag_func):
+    """Кэширует ответы анонимным пользователям целиком.
+
+    Ключ — ETag страницы, так что он меняется вместе с версиями её
+    областей, строкой запроса и языком. Ответы авторизованным
+    пользователям и ответы, ставящие cookies, не кэшируются.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            key = f'page:{etag_func(request, *args, **kwargs)}'
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(key, response, settings.FEED_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def shared_page(etag_func):
+    """Кэширует ответ целиком для всех пользователей по ETag.
+
+    Для страниц, которые от пользователя не зависят, — например, лент
+    RSS и Atom: каждая версия собирается один раз.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = f'shared:{etag_func(request, *args, **kwargs)}'
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(key, response, settings.FEED_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def _group_id(slug):
+    return (
+        Group.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    )
+
+
+def _author_id(username):
+    return (
+        User.objects.filter(username=username)
+        .values_list('pk', flat=True).first()
+    )
+
+
+@once_per_request
+def index_etag(request):
+    return etag(request, 'index')
+
+
+@once_per_request
+def group_etag(request, slug):
+    return etag(request, f'group:{_group_id(slug)}')
+
+
+@once_per_request
+def profile_etag(request, username):
+    author_id = _author_id(username)
+    return etag(request, f'profile:{author_id}', f'followers:{author_id}')
+
+
+@once_per_request
+def post_etag(request, post_id):
+    author_id = (
+        Post.objects.filter(pk=post_id)
+        .values_list('author_id', flat=True).first()
+    )
+    return etag(request, f'post:{post_id}', f'profile:{author_id}')
+
+
+@once_per_request
+def comments_etag(request, post_id):
+    return etag(request, f'comments:{post_id}')
+
+
+@once_per_request
+def index_feed_etag(request):
+    return shared_etag(request, 'index')
+
+
+@once_per_request
+def group_feed_etag(request, slug):
+    return shared_etag(request, f'group:{_group_id(slug)}')
+
+
+@once_per_request
+def profile_feed_etag(request, username):
+    return shared_etag(request, f'profile:{_author_id(username)}')
@@ -0,0 +1,44 @@
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import Post, StoredImage, UserStats
+
+
+def _shift(deltas):
+    return {
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items()
+    }
+
+
+def change_user_stats(user_id, **deltas):
+    """Сдвигает счётчики пользователя одним UPDATE без чтения строки.
+
+    Недостающая строка создаётся только при увеличении счётчиков:
+    уменьшение приходит и при каскадном удалении самого пользователя.
+    """
+    stats = UserStats.objects.filter(user_id=user_id)
+    if not stats.update(**_shift(deltas)) and min(deltas.values()) > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        stats.update(**_shift(deltas))
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(**_shift({'comments_count': delta}))
+
+
+def followers_count(user_id):
+    return (
+        UserStats.objects.filter(user_id=user_id)
+        .values_list('followers_count', flat=True)
+        .first()
+    ) or 0
+
+
+def change_image_refs(name, delta):
+    """Сдвигает число ссылок на файл картинки; возвращает новое значение."""
+    refs = StoredImage.objects.filter(name=name)
+    if not refs.update(**_shift({'refs': delta})) and delta > 0:
+        StoredImage.objects.get_or_create(name=name)
+        refs.update(**_shift({'refs': delta}))
+    return refs.values_list('refs', flat=True).first() or 0
@@ -0,0 +1,96 @@
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+
+from .models import Comment
+
+# Колонки CSV: общие для постов и комментариев, лишние остаются пустыми.
+# Имена совпадают с полями manage.py import_data.
+COLUMNS = (
+    'type', 'id', 'post', 'parent', 'author', 'group', 'text', 'pub_date',
+    'created', 'image', 'image_url',
+)
+
+
+def _post(post):
+    return {
+        'type': 'post',
+        'id': post.pk,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'image': post.image.name or None,
+        'image_url': post.image.url if post.image else None,
+    }
+
+
+def _comment(comment):
+    return {
+        'type': 'comment',
+        'id': comment.pk,
+        'post': comment.post_id,
+        'parent': comment.parent_id,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def records(posts):
+    """Посты выборки и их комментарии по одной записи.
+
+    Посты читаются курсором по EXPORT_CHUNK_SIZE строк, комментарии —
+    одним потоковым запросом на каждую такую пачку постов, так что в
+    памяти не больше одной пачки, сколько бы постов ни было у автора.
+    """
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    rows = (
+        posts.select_related('author', 'group')
+        .only('text', 'pub_date', 'image', 'author', 'author__username',
+              'group', 'group__slug')
+        .order_by('pk')
+        .iterator(chunk_size=chunk_size)
+    )
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            return
+        yield from (_post(post) for post in batch)
+        comments = (
+            Comment.objects.filter(post_id__in=[post.pk for post in batch])
+            .select_related('author')
+            .only('post_id', 'parent_id', 'text', 'created', 'author',
+                  'author__username')
+            .order_by('post_id', 'path')
+            .iterator(chunk_size=chunk_size)
+        )
+        yield from (_comment(comment) for comment in comments)
+
+
+def as_jsonl(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class _Line:
+    """Файл для csv.writer, который просто возвращает записанное."""
+
+    def write(self, value):
+        return value
+
+
+def as_csv(records):
+    writer = csv.DictWriter(_Line(), COLUMNS, restval='')
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+
+# Формат -> (сериализатор, Content-Type).
+FORMATS = {
+    'jsonl': (as_jsonl, 'application/x-ndjson; charset=utf-8'),
+    'csv': (as_csv, 'text/csv; charset=utf-8'),
+}
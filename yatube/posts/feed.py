@@ -0,0 +1,189 @@
+import logging
+import time
+from collections import defaultdict, namedtuple
+from operator import attrgetter
+
+from django.conf import settings
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE: int = 500
+
+logger = logging.getLogger(__name__)
+
+FanOut = namedtuple('FanOut', ('post_id', 'entries', 'pulled', 'seconds'))
+
+
+def _write(entries):
+    written, batch = 0, []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            written, batch = written + len(batch), []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        written += len(batch)
+    return written
+
+
+def refresh_pulled(author_id):
+    """Переводит автора на сбор при чтении, если он набрал порог.
+
+    Обратный переход — только в push_back(): он дорогой и не должен
+    случаться в запросе отписки.
+    """
+    stats = UserStats.objects.filter(pk=author_id)
+    followers, pulled = (
+        stats.values_list('followers_count', 'feed_pulled').first()
+        or (0, False)
+    )
+    if not pulled and followers >= settings.FEED_PULL_THRESHOLD:
+        stats.update(feed_pulled=True)
+        pulled = True
+    return pulled
+
+
+def pulled_authors(author_ids):
+    """Авторы из author_ids, чьи посты собираются при чтении ленты.
+
+    Флаг читается из базы одним запросом: копия в кэше процесса не
+    узнала бы о переключении, сделанном в другом процессе.
+    """
+    return set(
+        UserStats.objects.filter(pk__in=author_ids, feed_pulled=True)
+        .values_list('pk', flat=True)
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты всех подписчиков автора.
+
+    Посты популярных авторов не раскладываются: их подписчики
+    забирают такие посты сами при чтении ленты.
+    """
+    started = time.monotonic()
+    pulled = bool(pulled_authors([post.author_id]))
+    entries = 0
+    if not pulled:
+        followers = (
+            Follow.objects.filter(author_id=post.author_id)
+            .values_list('user_id', flat=True)
+            .iterator()
+        )
+        entries = _write(
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers
+        )
+    stats = FanOut(post.pk, entries, pulled, time.monotonic() - started)
+    logger.info(
+        'fan-out post %s: %s entries, pulled=%s, %.1f ms',
+        stats.post_id, stats.entries, stats.pulled, stats.seconds * 1000,
+    )
+    return stats
+
+
+def fan_out_many(posts):
+    """fan_out для пачки постов: подписчики всех авторов одним запросом."""
+    posts = list(posts)
+    authors = {post.author_id for post in posts}
+    authors -= pulled_authors(authors)
+    followers = defaultdict(list)
+    rows = (
+        Follow.objects.filter(author_id__in=authors)
+        .values_list('author_id', 'user_id')
+        .iterator()
+    )
+    for author_id, user_id in rows:
+        followers[author_id].append(user_id)
+    return _write(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for post in posts
+        for user_id in followers[post.author_id]
+    )
+
+
+def backfill(follow):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    posts = (
+        Post.objects.filter(author_id=follow.author_id)
+        .values_list('pk', 'pub_date')
+        .iterator()
+    )
+    return _write(
+        TimelineEntry(
+            user_id=follow.user_id,
+            post_id=post_id,
+            author_id=follow.author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts
+    )
+
+
+def trim(follow):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id,
+        author_id=follow.author_id,
+    ).delete()
+
+
+def follow_added(follow):
+    if not refresh_pulled(follow.author_id):
+        backfill(follow)
+
+
+def follow_removed(follow):
+    trim(follow)
+
+
+def push_back(author_id):
+    """Возвращает автора к раскладке постов по лентам подписчиков.
+
+    Сначала снимается флаг, чтобы новые посты уже раскладывались, затем
+    старые посты копируются в ленты; повторные записи игнорируются.
+    """
+    UserStats.objects.filter(pk=author_id).update(feed_pulled=False)
+    follows = Follow.objects.filter(author_id=author_id).iterator()
+    return sum(backfill(follow) for follow in follows)
+
+
+def timeline(user):
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+
+
+def sources(user):
+    """Источники ленты подписок для MergedCursorPaginator.
+
+    Разложенные посты читаются из таймлайна пользователя, посты
+    популярных авторов — отдельным keyset-срезом по каждому автору.
+    """
+    follows = Follow.objects.filter(user=user).values_list(
+        'author_id', 'author__stats__feed_pulled'
+    )
+    pulled = {author_id for author_id, flag in follows if flag}
+    pushed = timeline(user)
+    if pulled:
+        pushed = pushed.exclude(author_id__in=pulled)
+    result = [(pushed, 'post_id', attrgetter('post'))]
+    for author_id in sorted(pulled):
+        result.append((
+            Post.objects.filter(author_id=author_id)
+            .select_related('author', 'group'),
+            'pk',
+            lambda post: post,
+        ))
+    return result
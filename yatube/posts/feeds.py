@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+from django.views.decorators.http import condition
+
+from . import caching
+from .models import Group, Post, User
+
+TITLE_LENGTH: int = 60
+
+
+def latest(posts):
+    """Первая страница ключевой пагинации по (pub_date, id), без COUNT."""
+    return (
+        posts.select_related('author', 'group')
+        .only('text', 'pub_date', 'author', 'author__username',
+              'author__first_name', 'author__last_name', 'group',
+              'group__title')
+        .order_by('-pub_date', '-pk')[:settings.FEED_SIZE]
+    )
+
+
+class PostFeed(Feed):
+    """Общее для лент: как пост превращается в запись."""
+
+    def item_title(self, item):
+        return Truncator(item.text).chars(TITLE_LENGTH)
+
+    def item_description(self, item):
+        return linebreaks(item.text, autoescape=True)
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.pk])
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group_id else []
+
+
+class IndexFeed(PostFeed):
+    title = 'Yatube: последние записи'
+    description = 'Новые посты всех авторов.'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return latest(Post.objects.all())
+
+
+class GroupFeed(PostFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=[group.slug])
+
+    def items(self, group):
+        return latest(group.posts.all())
+
+
+class ProfileFeed(PostFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Посты пользователя {author.username}.'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def items(self, author):
+        return latest(author.posts.all())
+
+
+class IndexAtomFeed(IndexFeed):
+    feed_type = Atom1Feed
+    subtitle = IndexFeed.description
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+    subtitle = GroupFeed.description
+
+
+class ProfileAtomFeed(ProfileFeed):
+    feed_type = Atom1Feed
+    subtitle = ProfileFeed.description
+
+
+def cached(feed, etag_func):
+    """Лента собирается один раз на версию областей и отдаёт 304."""
+    return condition(etag_func=etag_func)(
+        caching.shared_page(etag_func)(feed)
+    )
+
+
+index_rss = cached(IndexFeed(), caching.index_feed_etag)
+index_atom = cached(IndexAtomFeed(), caching.index_feed_etag)
+group_rss = cached(GroupFeed(), caching.group_feed_etag)
+group_atom = cached(GroupAtomFeed(), caching.group_feed_etag)
+profile_rss = cached(ProfileFeed(), caching.profile_feed_etag)
+profile_atom = cached(ProfileAtomFeed(), caching.profile_feed_etag)
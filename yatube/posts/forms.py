@@ -1,6 +1,8 @@
 from django import forms
+from django.conf import settings
 
-from .models import Comment, Post
+from . import uploads
+from .models import Comment, Group, Post, User
 
 
 class BaseForm(forms.ModelForm):
@@ -19,8 +21,67 @@ class PostForm(BaseForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if image and hasattr(image, 'content_type'):
+            image = uploads.normalize(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
+    """Комментарий или, с parent в данных формы, ответ на комментарий.
+
+    parent не поле формы, а скрытый параметр: ответить можно только на
+    комментарий к тому же посту и не глубже COMMENT_MAX_DEPTH.
+    """
+
+    def __init__(self, *args, post=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.post = post
+
     class Meta():
         model = Comment
         fields = ('text',)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        parent_id = self.data.get('parent')
+        if not parent_id or self.post is None:
+            return cleaned_data
+        parent = None
+        if str(parent_id).isdigit():
+            parent = (
+                self.post.comments.only('pk', 'post_id', 'path')
+                .filter(pk=parent_id).first()
+            )
+        if parent is None:
+            raise forms.ValidationError('Такого комментария нет.')
+        if parent.depth + 1 >= settings.COMMENT_MAX_DEPTH:
+            raise forms.ValidationError('Эта ветка слишком глубокая.')
+        self.instance.parent = parent
+        return cleaned_data
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Что ищем', max_length=200)
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        label='Группа',
+        required=False,
+        to_field_name='slug',
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
+
+    def clean_author(self):
+        """Имя автора превращаем в id, чтобы фильтровать по индексу."""
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        author_id = (
+            User.objects.filter(username=username)
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if author_id is None:
+            raise forms.ValidationError('Такого автора нет.')
+        return author_id
@@ -0,0 +1,149 @@
+import multiprocessing
+import time
+import uuid
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Post, User
+
+
+class Stats:
+    """Время ответов и ошибки одной роли по всем её процессам."""
+
+    def __init__(self):
+        self.times = []
+        self.errors = Counter()
+
+    def add(self, seconds, error=None):
+        if error is None:
+            self.times.append(seconds)
+        else:
+            self.errors[error] += 1
+
+    def update(self, other):
+        self.times.extend(other.times)
+        self.errors.update(other.errors)
+
+    def percentile(self, percent):
+        """Перцентиль по ближайшему рангу; statistics.quantiles нет в 3.7."""
+        times = sorted(self.times)
+        rank = -(-len(times) * percent // 100)
+        return times[max(rank, 1) - 1]
+
+    def report(self, name, elapsed):
+        line = f'{name}: {len(self.times)} запросов, '
+        line += f'{len(self.times) / elapsed:.1f}/с'
+        if self.times:
+            line += (
+                f', p50 {self.percentile(50) * 1000:.1f} мс, '
+                f'p95 {self.percentile(95) * 1000:.1f} мс'
+            )
+        if self.errors:
+            line += '; ошибки: ' + ', '.join(
+                f'{error} ×{count}' for error, count in self.errors.items()
+            )
+        return line
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочная проверка базы: процессы-читатели открывают ленту, '
+        'профиль и пост, пока процессы-писатели создают посты и '
+        'комментарии. Работает с настроенной базой; созданных '
+        'пользователей и их записи удаляет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+
+    def handle(self, *args, seconds, readers, writers, **options):
+        suffix = uuid.uuid4().hex[:8]
+        self.author = User.objects.create_user(username=f'bench-{suffix}')
+        self.reader = User.objects.create_user(
+            username=f'bench-reader-{suffix}'
+        )
+        self.post = Post.objects.create(text='Пост', author=self.author)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        self.stdout.write(
+            f'journal_mode={journal_mode}, '
+            f'CONN_MAX_AGE={connection.settings_dict["CONN_MAX_AGE"]}'
+        )
+        # Процессы, а не потоки: как воркеры gunicorn, они не делят GIL.
+        # Соединение родителя закрываем, чтобы потомки открыли свои.
+        connection.close()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        self.deadline = time.monotonic() + seconds
+        workers = [
+            context.Process(target=self.run, args=(self.read, results))
+            for _ in range(readers)
+        ] + [
+            context.Process(target=self.run, args=(self.write, results))
+            for _ in range(writers)
+        ]
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        stats = {self.read.__name__: Stats(), self.write.__name__: Stats()}
+        for _ in workers:
+            name, found = results.get()
+            stats[name].update(found)
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+        self.stdout.write(stats['read'].report('Чтение', elapsed))
+        self.stdout.write(stats['write'].report('Запись', elapsed))
+        User.objects.filter(pk__in=(self.author.pk, self.reader.pk)).delete()
+
+    def run(self, action, results):
+        # Как между запросами настоящего сервера: соединение закрывается
+        # или переиспользуется по CONN_MAX_AGE.
+        stats = Stats()
+        client = Client()
+        client.force_login(
+            self.author if action == self.write else self.reader
+        )
+        number = 0
+        try:
+            while time.monotonic() < self.deadline:
+                number += 1
+                started = time.monotonic()
+                try:
+                    response = action(client, number)
+                except DatabaseError as error:
+                    stats.add(0, error=str(error))
+                else:
+                    if response.status_code >= 400:
+                        stats.add(0, error=f'HTTP {response.status_code}')
+                    else:
+                        stats.add(time.monotonic() - started)
+                close_old_connections()
+        finally:
+            connection.close()
+            results.put((action.__name__, stats))
+
+    def read(self, client, number):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+        return client.get(urls[number % len(urls)])
+
+    def write(self, client, number):
+        if number % 2:
+            return client.post(
+                reverse('posts:post_create'), {'text': f'Пост {number}'}
+            )
+        return client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': f'Комментарий {number}'},
+        )
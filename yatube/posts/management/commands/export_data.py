@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты автора или группы вместе с комментариями в JSONL '
+        'или CSV; формат понимает import_data.'
+    )
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--profile', help='Имя автора.')
+        source.add_argument('--group', help='Slug группы.')
+        parser.add_argument(
+            '--format', dest='file_format', choices=tuple(export.FORMATS),
+            default='jsonl',
+        )
+        parser.add_argument(
+            '--output', default='-', help='Файл или «-» для stdout.',
+        )
+
+    def handle(self, *args, profile, group, file_format, output, **options):
+        if profile is not None:
+            owner = User.objects.filter(username=profile).first()
+            if owner is None:
+                raise CommandError(f'Нет пользователя {profile}')
+            posts = owner.posts.all()
+        else:
+            found = Group.objects.filter(slug=group).first()
+            if found is None:
+                raise CommandError(f'Нет группы {group}')
+            posts = found.posts.all()
+        serialize, _ = export.FORMATS[file_format]
+        lines = serialize(export.records(posts))
+        if output == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(output, 'w', encoding='utf-8', newline='') as file:
+            file.writelines(lines)
+        self.stderr.write(f'Выгрузка записана в {output}')
@@ -0,0 +1,148 @@
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts import thumbnails
+from posts.models import Post
+
+ORIGINALS = Post._meta.get_field('image').upload_to.rstrip('/')
+THUMBNAILS = sorl_settings.THUMBNAIL_PREFIX.rstrip('/')
+
+
+def walk(root, after=(), top=()):
+    """Файлы под root в порядке обхода, начиная после пути after.
+
+    Пути — кортежи частей: так порядок сравнения совпадает с порядком
+    обхода отсортированных каталогов, и продолжить с курсора можно,
+    не заходя в уже пройденные каталоги.
+    """
+    try:
+        entries = sorted(
+            os.scandir(os.path.join(root, *top)), key=lambda entry: entry.name
+        )
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        parts = top + (entry.name,)
+        if entry.is_dir(follow_symlinks=False):
+            if parts >= after[:len(parts)]:
+                yield from walk(root, after, parts)
+        elif entry.is_file(follow_symlinks=False) and parts > after:
+            yield parts, entry.stat()
+
+
+def media_files(after=()):
+    """Оригиналы и миниатюры из MEDIA_ROOT, начиная после курсора."""
+    for top in sorted((ORIGINALS, THUMBNAILS)):
+        if (top,) >= after[:1]:
+            yield from walk(settings.MEDIA_ROOT, after, (top,))
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из MEDIA_ROOT оригиналы картинок, на которые не ссылается '
+        'ни один пост, и миниатюры, которых нет в хранилище sorl. Работает '
+        'пачками с паузами и может продолжать обход с места остановки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько файлов сверять с базой за один запрос.',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0.1,
+            help='Пауза между пачками, секунд.',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Сколько файлов просмотреть за запуск; остальное — в '
+                 'следующий раз.',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=settings.MEDIA_GC_MIN_AGE,
+            help='Не трогать файлы моложе стольких секунд.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не удаляя.',
+        )
+
+    def handle(self, *args, batch_size, sleep, limit, min_age, dry_run,
+               **options):
+        self.dry_run = dry_run
+        self.deleted = self.freed = scanned = 0
+        state = os.path.join(settings.MEDIA_ROOT, settings.MEDIA_GC_STATE)
+        after = self.load_cursor(state)
+        files = media_files(after)
+        if limit is not None:
+            files = islice(files, limit)
+        deadline = time.time() - min_age
+        finished = True
+        while True:
+            batch = list(islice(files, batch_size))
+            if not batch:
+                break
+            scanned += len(batch)
+            self.collect(
+                [(parts, stat) for parts, stat in batch
+                 if stat.st_mtime < deadline]
+            )
+            if not dry_run:
+                self.save_cursor(state, batch[-1][0])
+            if limit is not None and scanned >= limit:
+                finished = False
+                break
+            time.sleep(sleep)
+        if finished and not dry_run and os.path.exists(state):
+            os.remove(state)
+        self.stdout.write(self.style.SUCCESS(
+            f'Просмотрено файлов: {scanned}, удалено: {self.deleted}, '
+            f'освобождено байт: {self.freed}'
+            + ('' if finished else '; обход продолжится со следующего '
+                                   'запуска')
+        ))
+
+    def load_cursor(self, state):
+        try:
+            with open(state) as file:
+                return tuple(file.read().strip().split('/'))
+        except FileNotFoundError:
+            return ()
+
+    def save_cursor(self, state, parts):
+        with open(state, 'w') as file:
+            file.write('/'.join(parts))
+
+    def collect(self, batch):
+        originals, generated = {}, {}
+        for parts, stat in batch:
+            name = '/'.join(parts)
+            if parts[0] == ORIGINALS:
+                originals[name] = stat.st_size
+            elif parts[0] == THUMBNAILS:
+                generated[name] = stat.st_size
+        if originals:
+            used = set(
+                Post.objects.filter(image__in=list(originals))
+                .values_list('image', flat=True)
+            )
+            for name in originals.keys() - used:
+                self.remove(name, originals[name], thumbnails.drop)
+        if generated:
+            known = thumbnails.known_thumbnails(generated)
+            for name in generated.keys() - known:
+                self.remove(name, generated[name], default.storage.delete)
+
+    def remove(self, name, size, delete):
+        if self.dry_run:
+            self.stdout.write(f'Лишний файл: {name}')
+        else:
+            delete(name)
+        self.deleted += 1
+        self.freed += size
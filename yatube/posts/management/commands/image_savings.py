@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import ImageVariant
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает по записанным размерам вариантов картинок, сколько байт '
+        'экономит каждый формат по сравнению с запасным и с оригиналами.'
+    )
+
+    def handle(self, *args, **options):
+        baseline = settings.THUMBNAIL_CARD_FORMATS[-1]
+        variants, originals = {}, {}
+        rows = ImageVariant.objects.values_list(
+            'source', 'width', 'image_format', 'size', 'source_size'
+        ).iterator()
+        for source, width, image_format, size, source_size in rows:
+            variants.setdefault((source, width), {})[image_format] = size
+            originals[source] = source_size
+        self.stdout.write(
+            f'Оригиналы: {len(originals)} файлов, '
+            f'{sum(originals.values())} байт'
+        )
+        for image_format in settings.THUMBNAIL_CARD_FORMATS:
+            total = own = compared = count = 0
+            for sizes in variants.values():
+                if image_format not in sizes:
+                    continue
+                count += 1
+                total += sizes[image_format]
+                if baseline in sizes:
+                    own += sizes[image_format]
+                    compared += sizes[baseline]
+            if not count:
+                continue
+            line = f'{image_format}: {count} вариантов, {total} байт'
+            if image_format != baseline and compared:
+                line += f', к {baseline}: {own / compared - 1:+.1%}'
+            self.stdout.write(line)
@@ -0,0 +1,475 @@
+import csv
+import json
+import mimetypes
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from PIL import Image
+
+from posts import caching, counters, feed, threads, uploads
+from posts.models import Comment, Follow, Group, Post, User
+
+MODELS = ('post', 'comment', 'follow')
+
+# Сколько найденных авторов и групп держать в памяти между пачками.
+LOOKUP_LIMIT: int = 100_000
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(path, file_format):
+    """Строки файла по одной: (номер строки, словарь полей).
+
+    Файл читается потоком, поэтому память не зависит от его размера;
+    «-» — стандартный ввод.
+    """
+    file = sys.stdin if path == '-' else open(path, encoding='utf-8',
+                                              newline='')
+    try:
+        if file_format == 'csv':
+            for number, row in enumerate(csv.DictReader(file), start=2):
+                yield number, {
+                    key: value for key, value in row.items() if value != ''
+                }
+            return
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield number, RowError(f'не JSON: {error}')
+                continue
+            if not isinstance(row, dict):
+                yield number, RowError('ожидался объект JSON')
+                continue
+            yield number, row
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def row_ids(chunk, field):
+    """Числовые значения поля field в строках пачки."""
+    ids = set()
+    for _, row in chunk:
+        try:
+            ids.add(int(row[field]))
+        except (KeyError, TypeError, ValueError):
+            pass
+    return ids
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Lookup:
+    """Ключ -> id с дочитыванием из базы только недостающих ключей."""
+
+    def __init__(self, queryset, field):
+        self.queryset = queryset
+        self.field = field
+        self.known = {}
+
+    def load(self, keys):
+        keys = set(keys)
+        missing = keys - self.known.keys()
+        if not missing:
+            return
+        if len(self.known) + len(missing) > LOOKUP_LIMIT:
+            self.known.clear()
+            missing = keys
+        self.known.update(
+            self.queryset.filter(**{f'{self.field}__in': missing})
+            .values_list(self.field, 'pk')
+        )
+
+    def __getitem__(self, key):
+        try:
+            return self.known[key]
+        except KeyError:
+            raise RowError(f'не найдено: {key}') from None
+
+
+@contextmanager
+def explicit_dates(model, name):
+    """Даёт сохранить дату из файла в поле с auto_now_add."""
+    field = model._meta.get_field(name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def required(row, name):
+    value = row.get(name)
+    if value in (None, ''):
+        raise RowError(f'нет поля {name}')
+    return str(value)
+
+
+def optional_id(row, name):
+    value = row.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{name} должно быть числом') from None
+
+
+def date(row, name):
+    value = row.get(name)
+    if value in (None, ''):
+        return timezone.now()
+    stamp = parse_datetime(str(value))
+    if stamp is None:
+        raise RowError(f'{name}: не дата ISO 8601')
+    if timezone.is_naive(stamp):
+        stamp = timezone.make_aware(stamp)
+    return stamp
+
+
+def lock_for_writes(model):
+    """Сразу делает текущую транзакцию пишущей.
+
+    Транзакции Django в SQLite отложенные: блокировка записи берётся
+    только на первой записи, и веб-запрос успел бы вставить строку между
+    чтением занятых id и bulk_create. UPDATE без строк берёт её сразу.
+    """
+    pk = model._meta.pk.name
+    model.objects.filter(**{pk: 0}).update(**{pk: 0})
+
+
+def allocate_ids(model, objects):
+    """Выдаёт id объектам без id: после наибольшего в базе и в пачке.
+
+    id нужны до вставки: bulk_create в SQLite их не возвращает, а по ним
+    строятся пути комментариев и ленты подписчиков.
+    """
+    top = model.objects.aggregate(top=Max('pk'))['top'] or 0
+    top = max([top] + [obj.pk for obj in objects if obj.pk is not None])
+    for obj in objects:
+        if obj.pk is None:
+            top += 1
+            obj.pk = top
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты, комментарии или подписки из JSONL или CSV. '
+        'Файл читается потоком, строки пишутся через bulk_create пачками, '
+        'каждая пачка — в своей транзакции вместе со счётчиками и лентами. '
+        'Из выгрузки export_data берутся строки только типа --model.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или «-» для stdin.')
+        parser.add_argument('--model', choices=MODELS, required=True)
+        parser.add_argument(
+            '--format', dest='file_format', choices=('jsonl', 'csv'),
+            default=None,
+            help='По умолчанию — по расширению файла.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк писать в одной транзакции.',
+        )
+        parser.add_argument(
+            '--images', default=None,
+            help='Каталог, относительно которого указаны картинки постов.',
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать неизвестных авторов без пароля.',
+        )
+        parser.add_argument(
+            '--progress', type=float, default=5,
+            help='Как часто печатать скорость, секунд.',
+        )
+
+    def handle(self, *args, path, model, file_format, batch_size, images,
+               create_users, progress, **options):
+        file_format = file_format or (
+            'csv' if path.lower().endswith('.csv') else 'jsonl'
+        )
+        if path != '-' and not os.path.exists(path):
+            raise CommandError(f'Нет файла {path}')
+        self.images = images
+        self.create_users = create_users
+        self.users = Lookup(User.objects.all(), 'username')
+        self.groups = Lookup(Group.objects.all(), 'slug')
+        self.imported = self.skipped = self.other_types = 0
+        write = getattr(self, f'import_{model}s')
+        started = reported = time.monotonic()
+        rows = self.own_rows(read_rows(path, file_format), model)
+        for chunk in chunks(rows, batch_size):
+            write(chunk)
+            now = time.monotonic()
+            if now - reported >= progress:
+                self.stdout.write(self.rate(started, now))
+                reported = now
+        self.stdout.write(self.style.SUCCESS(
+            self.rate(started, time.monotonic())
+            + f'; пропущено строк: {self.skipped}'
+            + (f'; строк другого типа: {self.other_types}'
+               if self.other_types else '')
+        ))
+        if model == 'post' and images:
+            self.stdout.write(
+                'Миниатюры для новых картинок подготовит warm_thumbnails.'
+            )
+
+    def own_rows(self, rows, model):
+        """Строки только своего типа.
+
+        В выгрузке export_data посты и комментарии лежат в одном файле и
+        различаются колонкой type; строки без неё считаются своими.
+        """
+        for number, row in rows:
+            if isinstance(row, dict) and row.get('type', model) != model:
+                self.other_types += 1
+                continue
+            yield number, row
+
+    def rate(self, started, now):
+        seconds = max(now - started, 1e-9)
+        return (
+            f'Импортировано строк: {self.imported} за {seconds:.1f} с, '
+            f'{self.imported / seconds:.0f} строк/с'
+        )
+
+    def build(self, chunk, make):
+        """Объекты из строк пачки; плохие строки пропускаются с ошибкой."""
+        built = []
+        for number, row in chunk:
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                built.append(make(row))
+            except (RowError, ValidationError) as error:
+                self.skipped += 1
+                message = getattr(error, 'messages', [str(error)])
+                self.stderr.write(f'Строка {number}: {" ".join(message)}')
+        return built
+
+    def load_users(self, chunk, *fields):
+        names = {
+            str(row[field]) for _, row in chunk if isinstance(row, dict)
+            for field in fields if row.get(field)
+        }
+        self.users.load(names)
+        missing = names - self.users.known.keys()
+        if missing and self.create_users:
+            User.objects.bulk_create(
+                (User(username=name, password=make_password(None))
+                 for name in missing),
+                ignore_conflicts=True,
+            )
+            self.users.load(missing)
+
+    def attach_image(self, value):
+        if not self.images:
+            raise RowError('картинки без --images не импортируются')
+        path = os.path.join(self.images, value)
+        if not os.path.isfile(path):
+            raise RowError(f'нет файла картинки {value}')
+        with open(path, 'rb') as file:
+            upload = SimpleUploadedFile(
+                os.path.basename(path), file.read(),
+                content_type=mimetypes.guess_type(path)[0],
+            )
+        field = Post._meta.get_field('image')
+        try:
+            upload = uploads.normalize(upload)
+        except (OSError, SyntaxError, Image.DecompressionBombError) as error:
+            # UnidentifiedImageError — тоже OSError.
+            raise RowError(f'{value}: не картинка ({error})') from None
+        return field.storage.save(field.upload_to + upload.name, upload)
+
+    def unique_ids(self, model, objects, label):
+        """Без объектов, чей id уже есть в базе или выше в пачке."""
+        taken = set(model.objects.filter(
+            pk__in=[obj.pk for obj in objects if obj.pk is not None]
+        ).values_list('pk', flat=True))
+        fresh = []
+        for obj in objects:
+            if obj.pk is not None:
+                if obj.pk in taken:
+                    self.skipped += 1
+                    self.stderr.write(f'{label} {obj.pk}: id уже занят')
+                    continue
+                taken.add(obj.pk)
+            fresh.append(obj)
+        return fresh
+
+    def import_posts(self, chunk):
+        self.load_users(chunk, 'author')
+        self.groups.load(
+            row['group'] for _, row in chunk
+            if isinstance(row, dict) and row.get('group')
+        )
+
+        def make(row):
+            group = row.get('group')
+            image = row.get('image')
+            return Post(
+                id=optional_id(row, 'id'),
+                text=required(row, 'text'),
+                author_id=self.users[required(row, 'author')],
+                group_id=self.groups[group] if group else None,
+                pub_date=date(row, 'pub_date'),
+                image=self.attach_image(image) if image else '',
+            )
+
+        posts = self.build(chunk, make)
+        with transaction.atomic(), explicit_dates(Post, 'pub_date'):
+            lock_for_writes(Post)
+            posts = self.unique_ids(Post, posts, 'Пост')
+            allocate_ids(Post, posts)
+            Post.objects.bulk_create(posts)
+            for author_id, total in Counter(
+                post.author_id for post in posts
+            ).items():
+                counters.change_user_stats(author_id, posts_count=total)
+            for name, total in Counter(
+                post.image.name for post in posts if post.image
+            ).items():
+                counters.change_image_refs(name, total)
+            feed.fan_out_many(posts)
+        caching.bump(*{
+            scope for post in posts
+            for scope in caching.post_scopes(
+                post.pk, post.author_id, post.group_id
+            )
+        })
+        self.imported += len(posts)
+
+    def import_comments(self, chunk):
+        self.load_users(chunk, 'author')
+        posts = {
+            pk: (pk, author_id, group_id)
+            for pk, author_id, group_id in Post.objects.filter(
+                pk__in=row_ids(chunk, 'post')
+            ).values_list('pk', 'author_id', 'group_id')
+        }
+
+        def make(row):
+            post_id = optional_id(row, 'post')
+            if post_id not in posts:
+                raise RowError(f'нет поста {post_id}')
+            return Comment(
+                id=optional_id(row, 'id'),
+                post_id=post_id,
+                parent_id=optional_id(row, 'parent'),
+                author_id=self.users[required(row, 'author')],
+                text=required(row, 'text'),
+                created=date(row, 'created'),
+            )
+
+        comments = self.build(chunk, make)
+        with transaction.atomic(), explicit_dates(Comment, 'created'):
+            lock_for_writes(Comment)
+            comments = self.unique_ids(Comment, comments, 'Комментарий')
+            allocate_ids(Comment, comments)
+            comments = self.thread(comments, row_ids(chunk, 'parent'))
+            Comment.objects.bulk_create(comments)
+            for post_id, total in Counter(
+                comment.post_id for comment in comments
+            ).items():
+                counters.change_comments_count(post_id, total)
+        caching.bump(*{
+            scope for comment in comments
+            for scope in caching.post_scopes(*posts[comment.post_id])
+            + [f'comments:{comment.post_id}']
+        })
+        self.imported += len(comments)
+
+    def thread(self, comments, parent_ids):
+        """Проставляет пути; родитель — из базы или выше в этой пачке."""
+        parents = {
+            pk: (post_id, path)
+            for pk, post_id, path in Comment.objects.filter(
+                pk__in=parent_ids
+            ).values_list('pk', 'post_id', 'path')
+        }
+        threaded = []
+        for comment in comments:
+            parent = parents.get(comment.parent_id)
+            if comment.parent_id and (
+                parent is None or parent[0] != comment.post_id
+            ):
+                self.skipped += 1
+                self.stderr.write(
+                    f'Комментарий {comment.pk}: нет родителя '
+                    f'{comment.parent_id} у того же поста'
+                )
+                continue
+            comment.path = threads.path_for(
+                comment.pk, parent[1] if parent else ''
+            )
+            parents[comment.pk] = (comment.post_id, comment.path)
+            threaded.append(comment)
+        return threaded
+
+    def import_follows(self, chunk):
+        self.load_users(chunk, 'user', 'author')
+
+        def make(row):
+            follow = Follow(
+                user_id=self.users[required(row, 'user')],
+                author_id=self.users[required(row, 'author')],
+            )
+            if follow.user_id == follow.author_id:
+                raise RowError('подписка на самого себя')
+            return follow
+
+        follows = self.build(chunk, make)
+        existing = set(
+            Follow.objects.filter(
+                user_id__in={follow.user_id for follow in follows},
+                author_id__in={follow.author_id for follow in follows},
+            ).values_list('user_id', 'author_id')
+        )
+        fresh = []
+        for follow in follows:
+            pair = (follow.user_id, follow.author_id)
+            if pair not in existing:
+                existing.add(pair)
+                fresh.append(follow)
+        with transaction.atomic():
+            Follow.objects.bulk_create(fresh)
+            for field, key in (
+                ('followers_count', 'author_id'),
+                ('following_count', 'user_id'),
+            ):
+                for user_id, total in Counter(
+                    getattr(follow, key) for follow in fresh
+                ).items():
+                    counters.change_user_stats(user_id, **{field: total})
+            for follow in fresh:
+                feed.follow_added(follow)
+        caching.bump(*{f'followers:{follow.author_id}' for follow in fresh})
+        self.skipped += len(follows) - len(fresh)
+        self.imported += len(fresh)
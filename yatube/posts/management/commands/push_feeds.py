@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import feed
+from posts.models import UserStats
+
+
+class Command(BaseCommand):
+    help = (
+        'Возвращает к раскладке по лентам авторов, у которых подписчиков '
+        'стало меньше FEED_PUSH_THRESHOLD: их посты копируются в ленты '
+        'оставшихся подписчиков.'
+    )
+
+    def handle(self, *args, **options):
+        authors = list(UserStats.objects.filter(
+            feed_pulled=True,
+            followers_count__lt=settings.FEED_PUSH_THRESHOLD,
+        ).values_list('pk', flat=True))
+        for author_id in authors:
+            entries = feed.push_back(author_id)
+            self.stdout.write(
+                f'Автор {author_id}: записей в лентах {entries}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Авторов возвращено к раскладке: {len(authors)}'
+        ))
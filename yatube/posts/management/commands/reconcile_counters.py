@@ -0,0 +1,125 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import (Comment, Follow, Post, StoredImage, User,
+                          UserStats)
+
+
+def _totals(queryset, field, ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': ids})
+        .values_list(field)
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет денормализованные счётчики постов, комментариев, '
+        'подписок и ссылок на картинки с данными и исправляет '
+        'расхождения пачками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк сверять в одной транзакции.',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        users = self.reconcile_users(batch_size)
+        posts = self.reconcile_posts(batch_size)
+        images = self.reconcile_images(batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: пользователи — {users}, посты — {posts}, '
+            f'картинки — {images}'
+        ))
+
+    def batches(self, queryset, batch_size):
+        last_pk = None
+        while True:
+            batch = queryset.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            ids = list(batch.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return
+            yield ids
+            last_pk = ids[-1]
+
+    def reconcile_users(self, batch_size):
+        fixed = 0
+        for ids in self.batches(User.objects.all(), batch_size):
+            with transaction.atomic():
+                posts = _totals(Post.objects, 'author_id', ids)
+                followers = _totals(Follow.objects, 'author_id', ids)
+                following = _totals(Follow.objects, 'user_id', ids)
+                stats = UserStats.objects.select_for_update().in_bulk(ids)
+                changed, missing = [], []
+                for user_id in ids:
+                    actual = {
+                        'posts_count': posts.get(user_id, 0),
+                        'followers_count': followers.get(user_id, 0),
+                        'following_count': following.get(user_id, 0),
+                    }
+                    row = stats.get(user_id)
+                    if row is None:
+                        missing.append(UserStats(user_id=user_id, **actual))
+                        continue
+                    if any(getattr(row, name) != value
+                           for name, value in actual.items()):
+                        for name, value in actual.items():
+                            setattr(row, name, value)
+                        changed.append(row)
+                UserStats.objects.bulk_create(missing)
+                UserStats.objects.bulk_update(
+                    changed,
+                    ('posts_count', 'followers_count', 'following_count'),
+                )
+                fixed += len(changed) + len(missing)
+        return fixed
+
+    def reconcile_posts(self, batch_size):
+        fixed = 0
+        for ids in self.batches(Post.objects.all(), batch_size):
+            with transaction.atomic():
+                comments = _totals(Comment.objects, 'post_id', ids)
+                changed = []
+                for post in (Post.objects.select_for_update()
+                             .filter(pk__in=ids).only('comments_count')):
+                    actual = comments.get(post.pk, 0)
+                    if post.comments_count != actual:
+                        post.comments_count = actual
+                        changed.append(post)
+                Post.objects.bulk_update(changed, ('comments_count',))
+                fixed += len(changed)
+        return fixed
+
+    def reconcile_images(self, batch_size):
+        actual = dict(
+            Post.objects.exclude(image='').exclude(image=None)
+            .values_list('image')
+            .annotate(total=Count('pk'))
+            .order_by()
+            .iterator()
+        )
+        fixed = 0
+        for ids in self.batches(StoredImage.objects.all(), batch_size):
+            with transaction.atomic():
+                changed = []
+                for row in StoredImage.objects.select_for_update().filter(
+                    pk__in=ids
+                ):
+                    refs = actual.pop(row.name, 0)
+                    if row.refs != refs:
+                        row.refs = refs
+                        changed.append(row)
+                StoredImage.objects.bulk_update(changed, ('refs',))
+                fixed += len(changed)
+        missing = [
+            StoredImage(name=name, refs=refs) for name, refs in actual.items()
+        ]
+        StoredImage.objects.bulk_create(missing, batch_size=batch_size)
+        return fixed + len(missing)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Готовит недостающие миниатюры для постов с картинками: '
+        'для старых загрузок и для тех, что не попали в очередь.'
+    )
+
+    def handle(self, *args, **options):
+        posts = (
+            Post.objects.exclude(image='').exclude(image=None)
+            .only('image', 'group_id')
+            .order_by('pk')
+            .iterator()
+        )
+        warmed = 0
+        for post in posts:
+            if all(thumbnails.lookup(post.image, name)
+                   for name in thumbnails.geometries()):
+                continue
+            thumbnails.generate(post.pk)
+            warmed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Подготовлены миниатюры для постов: {warmed}'
+        ))
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, verbose_name='Оригинал')),
+                ('name', models.CharField(max_length=50, verbose_name='Вариант')),
+                ('image_format', models.CharField(max_length=10, verbose_name='Формат')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+                ('size', models.PositiveIntegerField(verbose_name='Размер, байт')),
+                ('source_size', models.PositiveIntegerField(verbose_name='Размер оригинала, байт')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='imagevariant',
+            constraint=models.UniqueConstraint(fields=('source', 'name'), name='unique_image_variant'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:46
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def fill_stored_images(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    StoredImage = apps.get_model('posts', 'StoredImage')
+    images = (
+        Post.objects.exclude(image='').exclude(image=None)
+        .values_list('image')
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+    StoredImage.objects.bulk_create(
+        (StoredImage(name=name, refs=total) for name, total in images),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_imagevariant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Файл')),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='Число постов с картинкой')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(fill_stored_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+# Текст попадает в индекс с «ё», заменённой на «е»: unicode61 снимает
+# диакритику только с латиницы.
+NEW_TEXT = "replace(replace(new.text, 'ё', 'е'), 'Ё', 'Е')"
+OLD_TEXT = "replace(replace(old.text, 'ё', 'е'), 'Ё', 'Е')"
+TEXT = "replace(replace(text, 'ё', 'е'), 'Ё', 'Е')"
+
+CREATE = [
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(rowid, text) "
+    f"VALUES (new.id, {NEW_TEXT}); END",
+    "CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    f"VALUES ('delete', old.id, {OLD_TEXT}); END",
+    "CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text "
+    "ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    f"VALUES ('delete', old.id, {OLD_TEXT}); "
+    "INSERT INTO posts_post_fts(rowid, text) "
+    f"VALUES (new.id, {NEW_TEXT}); END",
+    "INSERT INTO posts_post_fts(rowid, text) "
+    f"SELECT id, {TEXT} FROM posts_post",
+]
+
+DROP = [
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TABLE IF EXISTS posts_post_fts',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        # Индекс построен на FTS5, поэтому есть только в SQLite.
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_stored_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE), run(DROP)),
+    ]
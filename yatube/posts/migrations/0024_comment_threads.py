@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:00
+
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat, LPad
+import django.db.models.deletion
+
+
+def fill_paths(apps, schema_editor):
+    # До веток все комментарии были корневыми: путь — только свой id.
+    Comment = apps.get_model('posts', 'Comment')
+    Comment.objects.update(path=Concat(
+        LPad(Cast('pk', CharField()), 10, Value('0')), Value('/')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.Comment', verbose_name='Ответ на'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Путь в ветке'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_thread_idx'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:12
+
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.expressions
+
+
+def drop_self_follows(apps, schema_editor):
+    # Подписки на себя ограничение запретит: удаляем их вместе с их
+    # вкладом в счётчики — сигналы в миграции не срабатывают.
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    own = Follow.objects.filter(user=F('author'))
+    users = list(own.values_list('user_id', flat=True))
+    own.delete()
+    UserStats.objects.filter(
+        pk__in=users, followers_count__gt=0, following_count__gt=0
+    ).update(
+        followers_count=F('followers_count') - 1,
+        following_count=F('following_count') - 1,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_comment_threads'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='follow',
+            unique_together=set(),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date'], name='post_group_date_idx'),
+        ),
+        migrations.RunPython(drop_self_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='not_follow_yourself'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled(apps, schema_editor):
+    # До флага сбор при чтении определялся одним порогом.
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gte=settings.FEED_PULL_THRESHOLD
+    ).update(feed_pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_constraints_and_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_pulled',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Лента собирается при чтении'),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# Полнотекстовый индекс комментариев для поиска в админке; устроен так
+# же, как индекс постов из 0023.
+NEW_TEXT = "replace(replace(new.text, 'ё', 'е'), 'Ё', 'Е')"
+OLD_TEXT = "replace(replace(old.text, 'ё', 'е'), 'Ё', 'Е')"
+TEXT = "replace(replace(text, 'ё', 'е'), 'Ё', 'Е')"
+
+CREATE = [
+    "CREATE VIRTUAL TABLE posts_comment_fts USING fts5("
+    "text, content='posts_comment', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_comment_fts_insert AFTER INSERT ON posts_comment "
+    "BEGIN "
+    "INSERT INTO posts_comment_fts(rowid, text) "
+    f"VALUES (new.id, {NEW_TEXT}); END",
+    "CREATE TRIGGER posts_comment_fts_delete AFTER DELETE ON posts_comment "
+    "BEGIN "
+    "INSERT INTO posts_comment_fts(posts_comment_fts, rowid, text) "
+    f"VALUES ('delete', old.id, {OLD_TEXT}); END",
+    "CREATE TRIGGER posts_comment_fts_update AFTER UPDATE OF text "
+    "ON posts_comment BEGIN "
+    "INSERT INTO posts_comment_fts(posts_comment_fts, rowid, text) "
+    f"VALUES ('delete', old.id, {OLD_TEXT}); "
+    "INSERT INTO posts_comment_fts(rowid, text) "
+    f"VALUES (new.id, {NEW_TEXT}); END",
+    "INSERT INTO posts_comment_fts(rowid, text) "
+    f"SELECT id, {TEXT} FROM posts_comment",
+]
+
+DROP = [
+    'DROP TRIGGER IF EXISTS posts_comment_fts_insert',
+    'DROP TRIGGER IF EXISTS posts_comment_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_comment_fts_update',
+    'DROP TABLE IF EXISTS posts_comment_fts',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        # Индекс построен на FTS5, поэтому есть только в SQLite.
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0026_feed_pulled'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE), run(DROP)),
+    ]
@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.db.models import CheckConstraint, F, Q, UniqueConstraint
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -50,6 +52,7 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True,
     )
@@ -58,9 +61,25 @@ class Post(models.Model):
         auto_now_add=True,
         db_index=True,
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        # Ленты автора и группы: фильтр и сортировка по одному индексу.
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date'],
+                name='post_group_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:self.LEN_OF_POST]
@@ -88,9 +107,39 @@ class Comment(models.Model):
         auto_now_add=True,
         db_index=True,
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='replies',
+        verbose_name='Ответ на',
+    )
+    # id всех предков и самого комментария по 10 цифр через «/»: ветка
+    # целиком — один диапазон по индексу (post, path).
+    path = models.CharField(
+        'Путь в ветке',
+        max_length=255,
+        blank=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=['post', 'path'],
+                name='comment_thread_idx'
+            ),
+            models.Index(
+                fields=['post', '-created'],
+                name='comment_post_created_idx'
+            ),
+        ]
+
+    @property
+    def depth(self):
+        return self.path.count('/') - 1
 
 
 class Follow(models.Model):
@@ -108,8 +157,107 @@ class Follow(models.Model):
     )
 
     class Meta:
-        UniqueConstraint(fields=['user', 'author'], name='unique_follow')
-        CheckConstraint(
-            check=~Q(user=F('author')),
-            name='not_follow_yourselfe'
-        )
+        # Уникальный индекс (user, author) заодно обслуживает проверку
+        # «подписан ли» и выборку подписок пользователя.
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow'
+            ),
+            CheckConstraint(
+                check=~Q(user=F('author')),
+                name='not_follow_yourself'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста'
+    )
+    pub_date = models.DateTimeField('Дата создания поста')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+    # Посты автора собираются при чтении ленты, а не раскладываются.
+    feed_pulled = models.BooleanField(
+        'Лента собирается при чтении', default=False, editable=False
+    )
+
+    def __str__(self):
+        return f'{self.user}: {self.posts_count} постов'
+
+
+class ImageVariant(models.Model):
+    source = models.CharField('Оригинал', max_length=255)
+    name = models.CharField('Вариант', max_length=50)
+    image_format = models.CharField('Формат', max_length=10)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    size = models.PositiveIntegerField('Размер, байт')
+    source_size = models.PositiveIntegerField('Размер оригинала, байт')
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['source', 'name'],
+                name='unique_image_variant'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.source}: {self.name}, {self.size} байт'
+
+
+class StoredImage(models.Model):
+    name = models.CharField('Файл', max_length=100, unique=True)
+    refs = models.PositiveIntegerField('Число постов с картинкой', default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.refs}'
@@ -0,0 +1,257 @@
+import binascii
+import heapq
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from hashlib import md5
+from math import ceil, isfinite
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+def encode_cursor(stamp, pk, number):
+    """Упаковывает ключ (дата или число, id) и номер страницы в токен."""
+    if isinstance(stamp, datetime):
+        stamp = stamp.isoformat()
+    else:
+        stamp = repr(float(stamp))
+    raw = f'{stamp}|{pk}|{number}'.encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _parse_stamp(value):
+    stamp = parse_datetime(value)
+    if stamp is None:
+        stamp = float(value)
+        if not isfinite(stamp):
+            raise ValueError(value)
+    return stamp
+
+
+def cached_count(queryset, timeout):
+    """COUNT(*) выборки, закэшированный по её SQL на timeout секунд.
+
+    None, если выборка не queryset или заведомо пуста.
+    """
+    try:
+        sql = str(queryset.query)
+    except (AttributeError, EmptyResultSet):
+        return None
+    return cache.get_or_set(
+        f'paginator:count:{md5(sql.encode()).hexdigest()}',
+        queryset.count,
+        timeout,
+    )
+
+
+def decode_cursor(token):
+    """Возвращает (ключ, id, номер страницы) или None для битого токена."""
+    if not token:
+        return None
+    try:
+        raw = urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        stamp, pk, number = raw.split('|')
+        stamp = _parse_stamp(stamp)
+        pk, number = int(pk), int(number)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+    if number < 1:
+        return None
+    return stamp, pk, number
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (field, tiebreaker) без COUNT(*) и OFFSET.
+
+    Любая страница — один диапазонный запрос по индексу: берём
+    per_page + 1 строк после (или до) ключа из курсора, лишняя строка
+    говорит о наличии следующей страницы. Ссылки на соседние страницы
+    строятся по ключам не дальше window страниц в каждую сторону, а
+    общее число записей берётся из total или из кэша.
+    """
+
+    window: int = 2
+    count_timeout: int = 300
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 tiebreaker='pk', total=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.field = field
+        self.tiebreaker = tiebreaker
+        self.total = total
+        self._number = 1
+        self._has_next = False
+
+    @cached_property
+    def count(self):
+        """Оценка числа записей: переданная явно или закэшированная."""
+        if self.total is not None:
+            return self.total
+        return cached_count(self.object_list, self.count_timeout)
+
+    @cached_property
+    def num_pages(self):
+        return self._number + 1 if self._has_next else self._number
+
+    @property
+    def estimated_pages(self):
+        if not self.count:
+            return None
+        return max(ceil(self.count / self.per_page), self.num_pages)
+
+    def key(self, obj):
+        return getattr(obj, self.field), getattr(obj, self.tiebreaker)
+
+    def cursor_for(self, obj, number):
+        return encode_cursor(*self.key(obj), number)
+
+    def _slice(self, queryset, tiebreaker, cursor, newer, limit, keys):
+        """До limit строк (или их ключей) по одну сторону от курсора."""
+        lookup, order = 'lt', (f'-{self.field}', f'-{tiebreaker}')
+        if newer:
+            lookup, order = 'gt', (self.field, tiebreaker)
+        if cursor is not None:
+            stamp, pk = cursor[:2]
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': stamp})
+                | Q(**{self.field: stamp, f'{tiebreaker}__{lookup}': pk})
+            )
+        queryset = queryset.order_by(*order)
+        if keys:
+            queryset = queryset.values_list(self.field, tiebreaker)
+        return list(queryset[:limit])
+
+    def fetch(self, cursor, newer, limit, keys=False):
+        return self._slice(
+            self.object_list, self.tiebreaker, cursor, newer, limit, keys
+        )
+
+    def get_page(self, after=None, before=None, last=False):
+        before = decode_cursor(before)
+        after = decode_cursor(after) if before is None else None
+        limit = self.per_page + 1
+        if before is not None:
+            rows = self.fetch(before, newer=True, limit=limit)
+            if len(rows) < limit:
+                return self.get_page()
+            rows = rows[:self.per_page][::-1]
+            number = max(before[2] - 1, 2)
+            has_next = True
+        elif last and after is None:
+            rows = self.fetch(None, newer=True, limit=limit)
+            if len(rows) < limit:
+                return self.get_page()
+            rows = rows[:self.per_page][::-1]
+            number = max(self.estimated_pages or 0, 2)
+            has_next = False
+        else:
+            rows = self.fetch(after, newer=False, limit=limit)
+            number = after[2] + 1 if after is not None else 1
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+        self._number, self._has_next = number, has_next
+        self.__dict__.pop('num_pages', None)
+        page = Page(rows, number, self)
+        page.next_cursor = (
+            self.cursor_for(rows[-1], number) if has_next else None
+        )
+        page.previous_cursor = (
+            self.cursor_for(rows[0], number) if number > 1 and rows else None
+        )
+        page.window = self.window_links(rows, number, has_next)
+        return page
+
+    def window_links(self, rows, number, has_next):
+        """Ссылки на страницы number ± window в виде (номер, query string).
+
+        Каждая сторона — один запрос ключей, ограниченный window
+        страницами, поэтому стоимость не зависит от глубины ленты.
+        """
+        links = [(number, None)]
+        if not rows or not self.window:
+            return links
+        if number > 1:
+            newer = self.fetch(
+                self.key(rows[0]), newer=True,
+                limit=self.window * self.per_page + 1, keys=True,
+            )
+            for step in range(1, self.window + 1):
+                if len(newer) <= (step - 1) * self.per_page:
+                    break
+                if len(newer) <= step * self.per_page:
+                    links.insert(0, (1, ''))
+                    break
+                anchor = newer[step * self.per_page]
+                links.insert(0, (
+                    number - step,
+                    f'after={encode_cursor(*anchor, number - step - 1)}',
+                ))
+        if has_next:
+            older = self.fetch(
+                self.key(rows[-1]), newer=False,
+                limit=(self.window - 1) * self.per_page + 1, keys=True,
+            )
+            anchors = [self.key(rows[-1])] + older[
+                self.per_page - 1::self.per_page
+            ]
+            for step, anchor in enumerate(anchors[:self.window], start=1):
+                if step > 1 and len(older) <= (step - 1) * self.per_page:
+                    break
+                links.append((
+                    number + step,
+                    f'after={encode_cursor(*anchor, number + step - 1)}',
+                ))
+        return links
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии поста по (created, id), новые первыми.
+
+    Следующие пачки подгружаются только вперёд по next_cursor, поэтому
+    ссылки на соседние страницы не строятся, а число комментариев
+    берётся из счётчика поста.
+    """
+
+    window: int = 0
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, field='created', **kwargs)
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """k-way слияние нескольких keyset-источников в одну ленту.
+
+    object_list — список троек (queryset, tiebreaker, transform): каждый
+    источник отдаёт свой срез по общему курсору, transform приводит
+    строку к объекту ленты, а heapq.merge сливает срезы по ключу.
+    Общее число записей неизвестно, если не передано в total.
+    """
+
+    @cached_property
+    def count(self):
+        return self.total
+
+    def key(self, obj):
+        return getattr(obj, self.field), obj.pk
+
+    def fetch(self, cursor, newer, limit, keys=False):
+        runs = []
+        for queryset, tiebreaker, transform in self.object_list:
+            rows = self._slice(
+                queryset, tiebreaker, cursor, newer, limit, keys
+            )
+            runs.append(rows if keys else [transform(row) for row in rows])
+        key = tuple if keys else self.key
+        rows, seen = [], set()
+        for row in heapq.merge(*runs, key=key, reverse=not newer):
+            if key(row) in seen:
+                continue
+            seen.add(key(row))
+            rows.append(row)
+            if len(rows) == limit:
+                break
+        return rows
@@ -0,0 +1,97 @@
+import re
+from collections import namedtuple
+
+from django.db import connection
+from django.utils.functional import cached_property
+
+from .models import Post
+from .paginator import CursorPaginator
+
+TABLE = 'posts_post_fts'
+
+# unicode61 снимает диакритику только с латиницы, поэтому «ё» приводим
+# к «е» сами: в индексе это делают триггеры из миграции 0023.
+YO = (('ё', 'е'), ('Ё', 'Е'))
+
+Search = namedtuple('Search', ('match', 'group_id', 'author_id'))
+
+
+def to_match(query):
+    """Строка поиска в безопасный запрос FTS5: все слова, каждое в кавычках.
+
+    Операторы FTS5 из пользовательского ввода не пропускаем; пустой
+    результат значит, что искать нечего.
+    """
+    for source, target in YO:
+        query = query.replace(source, target)
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', query))
+
+
+def match_condition(match, model=Post):
+    """Условие для queryset.extra(): строка подходит под запрос FTS5.
+
+    Индекс модели — таблица <db_table>_fts (миграции 0023 и 0027).
+    Не RawSQL в pk__in: Django оборачивает его во вторые скобки, и
+    SQLite считает подзапрос скалярным, беря только первую строку.
+    """
+    table = model._meta.db_table
+    return (
+        f'{table}.id IN (SELECT rowid FROM {table}_fts '
+        f'WHERE {table}_fts MATCH %s)',
+        [match],
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Keyset-пагинация результатов поиска по (релевантность, id).
+
+    object_list — Search; релевантность — bm25 из FTS5, чем меньше, тем
+    лучше, поэтому «старше» в терминах CursorPaginator значит «менее
+    релевантно». Число результатов не считается.
+    """
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, field='score', **kwargs)
+
+    @cached_property
+    def count(self):
+        return self.total
+
+    def fetch(self, cursor, newer, limit, keys=False):
+        search = self.object_list
+        where, params = [f'{TABLE} MATCH %s'], [search.match]
+        if search.group_id is not None:
+            where.append('post.group_id = %s')
+            params.append(search.group_id)
+        if search.author_id is not None:
+            where.append('post.author_id = %s')
+            params.append(search.author_id)
+        score, tiebreaker, order = '>', '<', 'score ASC, post.id DESC'
+        if newer:
+            score, tiebreaker, order = '<', '>', 'score DESC, post.id ASC'
+        if cursor is not None:
+            where.append(
+                f'(score {score} %s '
+                f'OR (score = %s AND post.id {tiebreaker} %s))'
+            )
+            params.extend((cursor[0], cursor[0], cursor[1]))
+        with connection.cursor() as db:
+            db.execute(
+                f'SELECT bm25({TABLE}) AS score, post.id FROM {TABLE} '
+                f'JOIN posts_post AS post ON post.id = {TABLE}.rowid '
+                f'WHERE {" AND ".join(where)} ORDER BY {order} LIMIT %s',
+                params + [limit],
+            )
+            rows = db.fetchall()
+        if keys:
+            return rows
+        posts = (
+            Post.objects.select_related('author', 'group')
+            .in_bulk([pk for _, pk in rows])
+        )
+        result = []
+        for score, pk in rows:
+            if pk in posts:
+                posts[pk].score = score
+                result.append(posts[pk])
+        return result
@@ -0,0 +1,149 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from . import caching, counters, feed, threads, thumbnails
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+UNKNOWN = object()
+
+# Посты, которые сейчас удаляются вместе с комментариями.
+_deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+def bump_post(post):
+    caching.bump(*caching.post_scopes(
+        post.pk, post.author_id, post.group_id,
+        getattr(post, '_loaded_group_id', None),
+    ))
+
+
+def bump_post_of(comment):
+    post = (
+        Post.objects.filter(pk=comment.post_id)
+        .values_list('pk', 'author_id', 'group_id')
+        .first()
+    )
+    if post is not None:
+        caching.bump(
+            *caching.post_scopes(*post), f'comments:{comment.post_id}'
+        )
+
+
+def loaded_group_id(post):
+    """group_id без запроса к базе, если поле отложено в .only()."""
+    if 'group_id' in post.get_deferred_fields():
+        return None
+    return post.__dict__.get('group_id')
+
+
+def image_name(post):
+    """Имя файла картинки; отложенное поле не загружаем ради сигнала."""
+    if 'image' in post.get_deferred_fields():
+        return UNKNOWN
+    image = post.__dict__.get('image')
+    return getattr(image, 'name', image) or None
+
+
+def release_image(name):
+    if name and counters.change_image_refs(name, -1) == 0:
+        transaction.on_commit(lambda: thumbnails.discard(name))
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    instance._loaded_group_id = loaded_group_id(instance)
+    instance._loaded_image = image_name(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, posts_count=1)
+        feed.fan_out(instance)
+    loaded, name = instance._loaded_image, image_name(instance)
+    if loaded is not UNKNOWN and name is not UNKNOWN and loaded != name:
+        if name:
+            counters.change_image_refs(name, 1)
+        release_image(loaded)
+    bump_post(instance)
+    instance._loaded_group_id = loaded_group_id(instance)
+    instance._loaded_image = name
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # Каскад удалит комментарии раньше поста: счётчик и кэш поста им
+    # трогать незачем, post_deleted сбросит всё одним разом.
+    deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    deleting_posts().discard(instance.pk)
+    counters.change_user_stats(instance.author_id, posts_count=-1)
+    if image_name(instance) is not UNKNOWN:
+        release_image(image_name(instance))
+    bump_post(instance)
+    caching.bump(f'comments:{instance.pk}')
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        threads.assign_path(instance)
+        counters.change_comments_count(instance.post_id, 1)
+    bump_post_of(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        return
+    counters.change_comments_count(instance.post_id, -1)
+    bump_post_of(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, created=False, **kwargs):
+    caching.bump('index', f'group:{instance.pk}')
+    if not created:
+        # Ссылки на группу есть и в постах на страницах авторов.
+        authors = (
+            instance.posts.order_by().values_list('author_id', flat=True)
+            .distinct()
+        )
+        caching.bump(*(f'profile:{pk}' for pk in authors.iterator()))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, followers_count=1)
+        counters.change_user_stats(instance.user_id, following_count=1)
+        feed.follow_added(instance)
+        caching.bump(f'followers:{instance.author_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, followers_count=-1)
+    counters.change_user_stats(instance.user_id, following_count=-1)
+    feed.follow_removed(instance)
+    caching.bump(f'followers:{instance.author_id}')
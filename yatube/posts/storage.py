@@ -0,0 +1,44 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла — sha256 его содержимого.
+
+    Файл из upload_to/<имя> сохраняется как
+    upload_to/ab/cd/abcd…<расширение>; одинаковые байты ложатся в один
+    и тот же файл, поэтому повторная загрузка не пишет ничего нового,
+    а миниатюры sorl, которые ключуются по имени, тоже общие.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Свежее время изменения защищает файл от сборщика мусора,
+            # пока пост со ссылкой на него ещё не сохранён.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
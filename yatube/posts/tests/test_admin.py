@@ -0,0 +1,153 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        start = User.objects.count()
+        authors = [
+            User.objects.create(username=f'author-{start + number}')
+            for number in range(count)
+        ]
+        posts = [
+            Post.objects.create(
+                text=f'Пост {start + number}', author=author,
+                group=self.group,
+            )
+            for number, author in enumerate(authors)
+        ]
+        Comment.objects.bulk_create(
+            Comment(text='Комментарий', author=author, post=post)
+            for author, post in zip(authors, posts)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=self.admin, author=author) for author in authors
+        )
+
+    def queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов списка не зависит от числа строк на странице"""
+        for model in ('post', 'comment', 'follow'):
+            url = reverse(f'admin:posts_{model}_changelist')
+            with self.subTest(model=model):
+                self.add_rows(2)
+                few = self.queries(url)
+                self.add_rows(10)
+                self.assertEqual(self.queries(url), few)
+
+    def test_count_is_cached(self):
+        """Повторный показ списка не считает строки заново"""
+        self.add_rows(3)
+        url = reverse('admin:posts_post_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        self.assertFalse(
+            [query for query in context if 'COUNT(' in query['sql']]
+        )
+
+    def test_search_uses_fulltext_index(self):
+        """Поиск в списке постов идёт по индексу FTS5"""
+        self.add_rows(3)
+        url = reverse('admin:posts_post_changelist')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'q': 'пост 1'})
+        self.assertEqual(
+            [post.text for post in response.context['cl'].result_list],
+            ['Пост 1'],
+        )
+        self.assertTrue(
+            [query for query in context if 'MATCH' in query['sql']]
+        )
+        response = self.client.get(url, {'q': 'пост'})
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+
+    def test_search_returns_every_match(self):
+        """Поиск по слову из нескольких постов находит их все"""
+        self.add_rows(3)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'пост'}
+        )
+        self.assertEqual(
+            sorted(post.text for post in response.context['cl'].result_list),
+            sorted(Post.objects.values_list('text', flat=True)),
+        )
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+
+    def test_comment_search_uses_fulltext_index(self):
+        """Поиск в списке комментариев идёт по индексу FTS5, а не LIKE"""
+        self.add_rows(3)
+        post = Post.objects.first()
+        comment = Comment.objects.create(
+            text='Ёжик в тумане', author=self.admin, post=post
+        )
+        url = reverse('admin:posts_comment_changelist')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'q': 'ежик'})
+        self.assertEqual(list(response.context['cl'].result_list), [comment])
+        sql = [query['sql'] for query in context]
+        self.assertTrue([query for query in sql if 'MATCH' in query])
+        self.assertFalse([query for query in sql if 'LIKE' in query])
+        response = self.client.get(url, {'q': 'комментарий'})
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+
+    def test_no_select_of_every_row(self):
+        """На формах нет выпадающих списков со всеми пользователями"""
+        self.add_rows(3)
+        post, other = Post.objects.select_related('author')[:2]
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=(post.pk,))
+        )
+        self.assertContains(response, post.author.username)
+        self.assertNotContains(response, other.author.username)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertNotContains(response, 'name="form-0-group"')
+
+    def test_comment_thread_not_editable(self):
+        """Пост и родителя комментария в админке не поменять"""
+        root = Comment.objects.create(
+            text='Корень', author=self.admin,
+            post=Post.objects.create(text='Пост', author=self.admin),
+        )
+        reply = Comment.objects.create(
+            text='Ответ', author=self.admin, post=root.post, parent=root
+        )
+        other = Comment.objects.create(
+            text='Другой', author=self.admin, post=root.post
+        )
+        url = reverse('admin:posts_comment_change', args=(reply.pk,))
+        response = self.client.get(url)
+        self.assertNotContains(response, 'name="parent"')
+        self.assertNotContains(response, 'name="post"')
+        self.client.post(url, {
+            'text': 'Ответ', 'author': self.admin.pk,
+            'post': root.post.pk, 'parent': other.pk,
+        })
+        reply.refresh_from_db()
+        self.assertEqual(reply.parent, root)
+        self.assertTrue(reply.path.startswith(root.path))
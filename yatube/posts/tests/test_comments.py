@@ -0,0 +1,223 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Post, User
+
+
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.ALL_COMMENTS: int = settings.COUNT_COMMENTS + 5
+        for number in range(cls.ALL_COMMENTS):
+            Comment.objects.create(
+                text=f'Комментарий {number}', author=cls.author,
+                post=cls.post,
+            )
+        cls.detail_url = reverse('posts:post_detail', args=(cls.post.pk,))
+        cls.comments_url = reverse('posts:comments', args=(cls.post.pk,))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_first_batch_on_detail(self):
+        """Под постом только первая пачка комментариев, новые первыми"""
+        response = self.client.get(self.detail_url)
+        comments = list(response.context['comments'])
+        self.assertEqual(len(comments), settings.COUNT_COMMENTS)
+        self.assertEqual(
+            comments[0].text, f'Комментарий {self.ALL_COMMENTS - 1}'
+        )
+        self.assertContains(response, self.comments_url)
+
+    def test_next_batch_html(self):
+        """Фрагмент продолжает список с места, где кончилась пачка"""
+        first = self.client.get(self.detail_url).context['comments']
+        response = self.client.get(
+            self.comments_url, {'after': first.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'includes/comments.html')
+        self.assertNotContains(response, '<html')
+        texts = [comment.text for comment in response.context['comments']]
+        self.assertEqual(len(texts), self.ALL_COMMENTS - len(first))
+        self.assertEqual(texts[-1], 'Комментарий 0')
+        self.assertFalse(response.context['comments'].has_next())
+
+    def test_next_batch_json(self):
+        """JSON отдаёт пачку и ссылку на следующую"""
+        data = self.client.get(self.comments_url, {'format': 'json'}).json()
+        self.assertEqual(len(data['comments']), settings.COUNT_COMMENTS)
+        self.assertEqual(data['comments'][0]['author'], 'author')
+        rest = self.client.get(data['next']).json()
+        self.assertEqual(
+            len(rest['comments']),
+            self.ALL_COMMENTS - settings.COUNT_COMMENTS,
+        )
+        self.assertIsNone(rest['next'])
+
+    def test_first_batch_cached(self):
+        """Повторный показ поста не читает комментарии из базы"""
+        self.client.get(self.detail_url)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.detail_url)
+        self.assertFalse(
+            [query for query in context if 'posts_comment' in query['sql']]
+        )
+
+    def test_add_comment_invalidates_cache(self):
+        """Новый комментарий сразу виден под постом"""
+        self.client.get(self.detail_url)
+        self.client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Свежий комментарий'},
+        )
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Свежий комментарий')
+
+    def test_unknown_post(self):
+        """Комментарии несуществующего поста — 404"""
+        response = self.client.get(
+            reverse('posts:comments', args=(self.post.pk + 100,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentThreadsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.other_post = Post.objects.create(text='Другой', author=cls.author)
+        cls.add_url = reverse('posts:add_comment', args=(cls.post.pk,))
+        cls.comments_url = reverse('posts:comments', args=(cls.post.pk,))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def reply(self, text, parent=None):
+        data = {'text': text}
+        if parent is not None:
+            data['parent'] = parent.pk
+        self.client.post(self.add_url, data)
+        return Comment.objects.get(text=text)
+
+    def test_reply_through_form(self):
+        """Ответ через add_comment попадает в ветку родителя"""
+        root = self.reply('Корень')
+        child = self.reply('Ответ', root)
+        grandchild = self.reply('Ответ на ответ', child)
+        self.assertEqual(child.parent, root)
+        self.assertTrue(grandchild.path.startswith(child.path))
+        self.assertEqual(
+            [root.depth, child.depth, grandchild.depth], [0, 1, 2]
+        )
+
+    def test_parent_from_other_post_rejected(self):
+        """Нельзя ответить на комментарий к другому посту"""
+        foreign = Comment.objects.create(
+            text='Чужой', author=self.author, post=self.other_post
+        )
+        self.client.post(
+            self.add_url, {'text': 'Ответ', 'parent': foreign.pk}
+        )
+        self.assertFalse(Comment.objects.filter(text='Ответ').exists())
+
+    def test_first_replies_in_one_query(self):
+        """Ветки страницы с первыми ответами — два запроса на всё"""
+        roots = [self.reply(f'Корень {number}') for number in range(3)]
+        for root in roots:
+            parent = root
+            for number in range(settings.COUNT_REPLIES + 1):
+                parent = self.reply(f'{root.text}: ответ {number}', parent)
+        post = Post.objects.get(pk=self.post.pk)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.comments_url)
+            comments = list(response.context['comments'])
+        self.assertEqual(
+            len([query for query in context
+                 if 'posts_comment' in query['sql']]),
+            2,
+        )
+        for comment in comments:
+            with self.subTest(root=comment.text):
+                self.assertEqual(
+                    len(comment.thread), settings.COUNT_REPLIES
+                )
+                self.assertTrue(comment.more_replies)
+                self.assertEqual(
+                    [reply.depth for reply in comment.thread],
+                    list(range(1, settings.COUNT_REPLIES + 1)),
+                )
+        self.assertEqual(post.comments_count, len(roots) * (
+            settings.COUNT_REPLIES + 2
+        ))
+
+    def test_no_more_replies_for_full_thread(self):
+        """Ветка ровно из COUNT_REPLIES ответов — без ссылки на остальные"""
+        full = self.reply('Полная')
+        for number in range(settings.COUNT_REPLIES):
+            self.reply(f'Ответ {number}', full)
+        longer = self.reply('Длиннее')
+        for number in range(settings.COUNT_REPLIES + 1):
+            self.reply(f'Ещё ответ {number}', longer)
+        data = self.client.get(self.comments_url, {'format': 'json'}).json()
+        more = {
+            comment['text']: comment['more_replies']
+            for comment in data['comments']
+        }
+        self.assertEqual(more, {'Полная': False, 'Длиннее': True})
+
+    def test_rest_of_thread(self):
+        """Остаток ветки отдаётся после последнего показанного ответа"""
+        root = self.reply('Корень')
+        replies = [
+            self.reply(f'Ответ {number}', root)
+            for number in range(settings.COUNT_REPLIES + 2)
+        ]
+        self.reply('Соседняя ветка')
+        shown = replies[settings.COUNT_REPLIES - 1]
+        data = self.client.get(self.comments_url, {
+            'thread': root.pk, 'after_path': shown.path, 'format': 'json',
+        }).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['comments']],
+            [reply.pk for reply in replies[settings.COUNT_REPLIES:]],
+        )
+
+    @override_settings(COUNT_COMMENTS=2)
+    def test_long_thread_paginated(self):
+        """Длинная ветка отдаётся пачками по COUNT_COMMENTS со ссылкой next"""
+        root = self.reply('Корень')
+        replies = [self.reply(f'Ответ {number}', root) for number in range(5)]
+        seen, url = [], self.comments_url
+        params = {'thread': root.pk, 'format': 'json'}
+        while url:
+            data = self.client.get(url, params).json()
+            self.assertLessEqual(len(data['comments']), 2)
+            seen.extend(comment['id'] for comment in data['comments'])
+            url, params = data['next'], None
+        self.assertEqual(seen, [reply.pk for reply in replies])
+        html = self.client.get(
+            self.comments_url, {'thread': root.pk}
+        ).content.decode()
+        self.assertIn('data-comments-more', html)
+
+    def test_delete_removes_subtree(self):
+        """Удаление комментария удаляет его ветку и правит счётчик"""
+        root = self.reply('Корень')
+        self.reply('Ответ на ответ', self.reply('Ответ', root))
+        root.delete()
+        self.assertFalse(Comment.objects.filter(post=self.post).exists())
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comments_count, 0
+        )
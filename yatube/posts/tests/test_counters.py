@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Post, User, UserStats
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='user_author')
+        cls.user_reader = User.objects.create_user(username='user_reader')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user_author)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание и удаление поста меняют счётчик постов автора"""
+        self.client.post(reverse('posts:post_create'), {'text': 'Пост'})
+        self.assertEqual(self.stats(self.user_author).posts_count, 1)
+        Post.objects.filter(author=self.user_author).delete()
+        self.assertEqual(self.stats(self.user_author).posts_count, 0)
+
+    def test_comment_counters(self):
+        """Комментарий увеличивает счётчик поста"""
+        post = Post.objects.create(text='Пост', author=self.user_author)
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.id}),
+            {'text': 'Комментарий'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Comment.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def delete_queries(self, comments):
+        post = Post.objects.create(text='Пост', author=self.user_author)
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.user_reader, text='Комментарий')
+            for _ in range(comments)
+        )
+        with CaptureQueriesContext(connection) as captured:
+            post.delete()
+        return len(captured)
+
+    def test_post_delete_queries_do_not_grow_with_comments(self):
+        """Удаление поста не трогает счётчик и кэш ради каждого комментария"""
+        self.assertEqual(self.delete_queries(10), self.delete_queries(1))
+        self.assertEqual(self.stats(self.user_author).posts_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики обеих сторон"""
+        self.client.force_login(self.user_reader)
+        self.client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.user_author.username}
+        ))
+        self.assertEqual(self.stats(self.user_author).followers_count, 1)
+        self.assertEqual(self.stats(self.user_reader).following_count, 1)
+        self.client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.user_author.username}
+        ))
+        self.assertEqual(self.stats(self.user_author).followers_count, 0)
+        self.assertEqual(self.stats(self.user_reader).following_count, 0)
+
+    def test_profile_does_not_count(self):
+        """Профиль берёт число постов из счётчика, а не из COUNT(*)"""
+        Post.objects.create(text='Пост', author=self.user_author)
+        UserStats.objects.filter(user=self.user_author).update(
+            posts_count=42
+        )
+        response = self.client.get(reverse(
+            'posts:profile',
+            kwargs={'username': self.user_author.username}
+        ))
+        self.assertContains(response, 'Всего постов: 42')
+
+    def test_reconcile_counters(self):
+        """Команда reconcile_counters исправляет расхождения"""
+        post = Post.objects.create(text='Пост', author=self.user_author)
+        Comment.objects.create(
+            post=post, author=self.user_reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.user_reader, author=self.user_author)
+        UserStats.objects.update(
+            posts_count=7, followers_count=7, following_count=7
+        )
+        UserStats.objects.filter(user=self.user_reader).delete()
+        Post.objects.update(comments_count=7)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        author_stats = self.stats(self.user_author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(author_stats.following_count, 0)
+        self.assertEqual(self.stats(self.user_reader).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
@@ -0,0 +1,167 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.picture = Post.objects.create(
+            text='С картинкой', author=cls.author, group=cls.group,
+            image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        cls.posts = [cls.picture] + [
+            Post.objects.create(text=f'Пост {number}', author=cls.author)
+            for number in range(4)
+        ]
+        cls.comment = Comment.objects.create(
+            post=cls.picture, author=cls.reader, text='Комментарий'
+        )
+        cls.reply = Comment.objects.create(
+            post=cls.picture, author=cls.author, text='Ответ',
+            parent=cls.comment,
+        )
+        Post.objects.create(text='Чужой пост', author=cls.reader)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+
+    def export(self, user, url, **params):
+        self.client.force_login(user)
+        return self.client.get(url, params)
+
+    def test_permissions(self):
+        """Свои посты выгружает автор и персонал, группу — только персонал"""
+        profile = reverse('posts:profile_export', args=[self.author.username])
+        group = reverse('posts:group_export', args=[self.group.slug])
+        cases = (
+            (self.author, profile, 200),
+            (self.staff, profile, 200),
+            (self.reader, profile, 403),
+            (self.author, group, 403),
+            (self.staff, group, 200),
+        )
+        for user, url, status in cases:
+            with self.subTest(user=user.username, url=url):
+                self.assertEqual(self.export(user, url).status_code, status)
+        self.client.logout()
+        response = self.client.get(profile)
+        self.assertEqual(response.status_code, 302)
+
+    def test_jsonl(self):
+        """JSONL: посты автора, затем их комментарии с картинкой и веткой"""
+        response = self.export(
+            self.author,
+            reverse('posts:profile_export', args=[self.author.username]),
+        )
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        records = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        posts = [record for record in records if record['type'] == 'post']
+        self.assertEqual(
+            [record['id'] for record in posts],
+            [post.pk for post in self.posts],
+        )
+        self.assertEqual(posts[0]['image'], self.picture.image.name)
+        self.assertEqual(posts[0]['group'], self.group.slug)
+        self.assertIsNone(posts[1]['image'])
+        comments = [
+            record for record in records if record['type'] == 'comment'
+        ]
+        self.assertEqual(
+            [(record['id'], record['parent'], record['author'])
+             for record in comments],
+            [(self.comment.pk, None, 'reader'),
+             (self.reply.pk, self.comment.pk, 'author')],
+        )
+        # Комментарии первой пачки идут сразу за её постами.
+        self.assertEqual(records.index(comments[0]), 2)
+
+    def test_csv(self):
+        """CSV с заголовком: строка на пост и на комментарий"""
+        response = self.export(
+            self.staff,
+            reverse('posts:group_export', args=[self.group.slug]),
+            format='csv',
+        )
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(
+            [(row['type'], row['text']) for row in rows],
+            [('post', 'С картинкой'), ('comment', 'Комментарий'),
+             ('comment', 'Ответ')],
+        )
+        self.assertEqual(rows[0]['image'], self.picture.image.name)
+
+    def test_unknown_format(self):
+        """Неизвестный формат — 400"""
+        response = self.export(
+            self.author,
+            reverse('posts:profile_export', args=[self.author.username]),
+            format='xml',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_queries_per_batch(self):
+        """Один курсор по постам и запрос комментариев на каждую пачку"""
+        response = self.export(
+            self.author,
+            reverse('posts:profile_export', args=[self.author.username]),
+        )
+        # Пять постов пачками по два: три запроса комментариев.
+        with self.assertNumQueries(4):
+            b''.join(response.streaming_content)
+
+    def test_command(self):
+        """export_data пишет тот же JSONL, что и страница выгрузки"""
+        out = StringIO()
+        call_command('export_data', '--profile=author', stdout=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(records), len(self.posts) + 2)
+        path = os.path.join(TEMP_MEDIA_ROOT, 'group.csv')
+        call_command(
+            'export_data', '--group=group', file_format='csv', output=path,
+            stderr=StringIO(),
+        )
+        with open(path, encoding='utf-8') as file:
+            self.assertEqual(len(list(csv.DictReader(file))), 3)
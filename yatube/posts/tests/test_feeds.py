@@ -0,0 +1,112 @@
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Group, Post, User
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+@override_settings(FEED_SIZE=3)
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.another = Group.objects.create(
+            title='Другая', slug='another', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+            for number in range(4)
+        ]
+        Post.objects.create(
+            text='Чужой пост', author=cls.other, group=cls.another
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def rss_titles(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        root = ElementTree.fromstring(response.content)
+        return [item.findtext('title') for item in root.iter('item')]
+
+    def test_rss_latest_posts_in_scope(self):
+        """RSS: последние FEED_SIZE постов области, новые сверху"""
+        newest = [post.text for post in reversed(self.posts)][:3]
+        self.assertEqual(
+            self.rss_titles(reverse('posts:index_rss')),
+            ['Чужой пост'] + newest[:2],
+        )
+        self.assertEqual(
+            self.rss_titles(reverse('posts:group_rss', args=['group'])),
+            newest,
+        )
+        self.assertEqual(
+            self.rss_titles(reverse('posts:profile_rss', args=['other'])),
+            ['Чужой пост'],
+        )
+
+    def test_atom(self):
+        """Atom-лента с автором и ссылкой на пост"""
+        response = self.client.get(
+            reverse('posts:profile_atom', args=['author'])
+        )
+        self.assertTrue(
+            response['Content-Type'].startswith('application/atom+xml')
+        )
+        entry = ElementTree.fromstring(response.content).find(f'{ATOM}entry')
+        self.assertEqual(
+            entry.findtext(f'{ATOM}author/{ATOM}name'), 'Лев Толстой'
+        )
+        self.assertTrue(
+            entry.find(f'{ATOM}link').get('href').endswith(
+                reverse('posts:post_detail', args=[self.posts[-1].pk])
+            )
+        )
+
+    def test_unknown_scope(self):
+        """Лента несуществующей группы или автора — 404"""
+        for url in (
+            reverse('posts:group_atom', args=['missing']),
+            reverse('posts:profile_rss', args=['missing']),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_cached_and_conditional(self):
+        """Повторный запрос — из кэша, с тем же ETag — 304"""
+        url = reverse('posts:index_rss')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalidated_by_posts_in_scope(self):
+        """Новый пост меняет ленты своей области, но не чужие"""
+        group_url = reverse('posts:group_rss', args=['group'])
+        another_url = reverse('posts:group_rss', args=['another'])
+        group_etag = self.client.get(group_url)['ETag']
+        another_etag = self.client.get(another_url)['ETag']
+        post = Post.objects.create(
+            text='Свежий пост', author=self.author, group=self.group
+        )
+        self.assertEqual(self.client.get(another_url)['ETag'], another_etag)
+        self.assertNotEqual(self.client.get(group_url)['ETag'], group_etag)
+        self.assertEqual(self.rss_titles(group_url)[0], 'Свежий пост')
+        post.delete()
+        self.assertNotIn('Свежий пост', self.rss_titles(group_url))
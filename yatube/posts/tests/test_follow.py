@@ -1,6 +1,11 @@
-from django.test import Client, TestCase
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from posts.models import Follow, Post, User
+from posts import feed
+from posts.models import Follow, Post, TimelineEntry, User, UserStats
 
 
 class FollowViewsTest(TestCase):
@@ -30,6 +35,7 @@ class FollowViewsTest(TestCase):
         cls.FOLLOW_INDEX_URL = reverse('posts:follow_index')
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.client.force_login(self.user_follower)
         Follow.objects.all().delete()
@@ -71,3 +77,130 @@ class FollowViewsTest(TestCase):
         self.client.force_login(self.user_author)
         response = self.client.get(self.FOLLOW_INDEX_URL)
         self.assertNotIn(self.post, response.context['page_obj'])
+
+    def test_timeline_fan_out(self):
+        """Новый пост автора попадает в ленту подписчика при публикации"""
+        new_post = Post.objects.create(
+            text='Новый пост',
+            author=self.user_author,
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.user_follower,
+                post=new_post,
+            ).exists()
+        )
+
+    def test_timeline_backfill_and_trim(self):
+        """Подписка дополняет ленту старыми постами, отписка их убирает"""
+        self.assertTrue(
+            self.user_follower.timeline.filter(post=self.post).exists()
+        )
+        self.client.post(self.UNFOLLOW_URL)
+        self.assertFalse(self.user_follower.timeline.exists())
+        self.client.post(self.FOLLOW_URL)
+        self.assertTrue(
+            self.user_follower.timeline.filter(post=self.post).exists()
+        )
+
+    def test_follow_index_queries(self):
+        """Лента подписок читается одним запросом к таймлайну"""
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=self.user_author)
+            for number in range(5)
+        )
+        for post in Post.objects.exclude(pk=self.post.pk):
+            TimelineEntry.objects.create(
+                user=self.user_follower,
+                post=post,
+                author=self.user_author,
+                pub_date=post.pub_date,
+            )
+        self.client.get(self.FOLLOW_INDEX_URL)
+        with self.assertNumQueries(4):
+            self.client.get(self.FOLLOW_INDEX_URL)
+
+    @override_settings(FEED_PULL_THRESHOLD=2)
+    def test_hybrid_feed(self):
+        """Посты популярного автора собираются при чтении ленты
+        и сливаются с разложенными постами по дате"""
+        other_author = User.objects.create(username='other_author')
+        Follow.objects.create(author=other_author, user=self.user_follower)
+        Follow.objects.create(author=self.user_author, user=other_author)
+        pushed_post = Post.objects.create(
+            text='Разложенный пост', author=other_author
+        )
+        pulled_post = Post.objects.create(
+            text='Пост популярного автора', author=self.user_author
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=pulled_post).exists()
+        )
+        self.assertEqual(feed.fan_out(pulled_post).entries, 0)
+        self.assertEqual(feed.fan_out(pushed_post).entries, 1)
+        response = self.client.get(self.FOLLOW_INDEX_URL)
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [pulled_post, pushed_post, self.post],
+        )
+        with self.settings(COUNT_POST=2):
+            first_page = self.client.get(
+                self.FOLLOW_INDEX_URL
+            ).context['page_obj']
+            second_page = self.client.get(
+                self.FOLLOW_INDEX_URL, {'after': first_page.next_cursor}
+            ).context['page_obj']
+        self.assertEqual(list(first_page), [pulled_post, pushed_post])
+        self.assertEqual(list(second_page), [self.post])
+
+    @override_settings(FEED_PULL_THRESHOLD=2)
+    def test_hybrid_feed_back_to_push(self):
+        """Автор, опустившийся ниже порога, снова раскладывается по лентам"""
+        other_follower = User.objects.create(username='other_follower')
+        Follow.objects.create(author=self.user_author, user=other_follower)
+        pulled_post = Post.objects.create(
+            text='Пост популярного автора', author=self.user_author
+        )
+        self.client.force_login(other_follower)
+        self.client.post(self.UNFOLLOW_URL)
+        # Отписка ничего не раскладывает: автор собирается при чтении,
+        # пока его не вернёт push_feeds.
+        self.assertFalse(
+            self.user_follower.timeline.filter(post=pulled_post).exists()
+        )
+        self.assertEqual(feed.pulled_authors([self.user_author.pk]),
+                         {self.user_author.pk})
+        call_command('push_feeds', stdout=StringIO())
+        self.assertTrue(
+            self.user_follower.timeline.filter(post=pulled_post).exists()
+        )
+        self.assertEqual(feed.fan_out(pulled_post).entries, 1)
+
+    @override_settings(FEED_PULL_THRESHOLD=2, FEED_PUSH_THRESHOLD=1)
+    def test_hybrid_feed_hysteresis(self):
+        """Между порогами автор остаётся на сборе при чтении"""
+        other_follower = User.objects.create(username='other_follower')
+        Follow.objects.create(author=self.user_author, user=other_follower)
+        self.client.force_login(other_follower)
+        self.client.post(self.UNFOLLOW_URL)
+        self.client.post(self.FOLLOW_URL)
+        self.client.post(self.UNFOLLOW_URL)
+        call_command('push_feeds', stdout=StringIO())
+        self.assertEqual(feed.pulled_authors([self.user_author.pk]),
+                         {self.user_author.pk})
+
+    def test_pull_switch_from_other_process(self):
+        """Переключение автора на сбор в другом процессе видно сразу"""
+        self.assertEqual(feed.pulled_authors([self.user_author.pk]), set())
+        # Другой процесс переводит автора на сбор при чтении, и новый
+        # подписчик уже не получает старых постов в таймлайн.
+        UserStats.objects.filter(pk=self.user_author.pk).update(
+            feed_pulled=True
+        )
+        newcomer = User.objects.create(username='newcomer')
+        Follow.objects.bulk_create(
+            [Follow(author=self.user_author, user=newcomer)]
+        )
+        self.client.force_login(newcomer)
+        response = self.client.get(self.FOLLOW_INDEX_URL)
+        self.assertIn(self.post, response.context['page_obj'])
@@ -1,11 +1,15 @@
+import hashlib
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from posts.forms import PostForm
 from posts.models import Comment, Group, Post, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -71,6 +75,10 @@ class PostsFormTests(TestCase):
         self.authorized_client.force_login(self.user_author)
         self.guest_client = Client()
 
+    def stored_name(self, content, extension='.gif'):
+        digest = hashlib.sha256(content).hexdigest()
+        return f'posts/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
     def check_form(self, form_data, name_form, image_way):
         """Вспомогательная функция для проверки соответствия переданных форм"""
         self.assertEqual(name_form.group.id, form_data['group'])
@@ -95,7 +103,9 @@ class PostsFormTests(TestCase):
         self.assertEqual(
             Post.objects.count(), self.NEW_OBJECTS
         )
-        self.check_form(form_data, Post.objects.last(), 'posts/small.gif')
+        self.check_form(
+            form_data, Post.objects.last(), self.stored_name(self.small_gif)
+        )
 
     def test_edit_post(self):
         """Проверка формы редактирования поста"""
@@ -117,7 +127,9 @@ class PostsFormTests(TestCase):
         edited_post = Post.objects.get(id=self.post.id)
         self.assertRedirects(response, self.POST_DETAIL)
         self.assertEqual(Post.objects.count(), self.post_count)
-        self.check_form(form_data, edited_post, 'posts/all.gif')
+        self.check_form(
+            form_data, edited_post, self.stored_name(self.small_gif)
+        )
 
     def test_comment_post_author(self):
         """Проверка комментариев для авторизованного пользователя"""
@@ -158,3 +170,87 @@ class PostsFormTests(TestCase):
         self.assertEqual(
             Comment.objects.count(), self.comment_count
         )
+
+
+def make_image(size, image_format='JPEG', orientation=None):
+    image = Image.new('RGB', size, color=(200, 30, 30))
+    options = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        options['exif'] = exif.tobytes()
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return SimpleUploadedFile(
+        f'photo.{image_format.lower()}', buffer.getvalue(),
+        content_type=Image.MIME[image_format],
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    def submit(self, image):
+        form = PostForm({'text': 'Пост с фото'}, {'image': image})
+        form.is_valid()
+        return form
+
+    def stored(self, form):
+        return Image.open(form.cleaned_data['image'])
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100)
+    def test_decompression_bomb_rejected(self):
+        """Картинка с гигантскими размерами в заголовке отклоняется"""
+        form = self.submit(make_image((20, 20)))
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'decompression_bomb'
+        )
+
+    @override_settings(IMAGE_UPLOAD_MAX_DIMENSION=50)
+    def test_large_image_downscaled(self):
+        """Длинная сторона уменьшается до IMAGE_UPLOAD_MAX_DIMENSION"""
+        for image_format in ('JPEG', 'PNG'):
+            with self.subTest(image_format=image_format):
+                form = self.submit(make_image((400, 200), image_format))
+                self.assertTrue(form.is_valid(), form.errors)
+                self.assertEqual(self.stored(form).size, (50, 25))
+                self.assertEqual(self.stored(form).format, image_format)
+
+    def test_orientation_applied_and_exif_stripped(self):
+        """Картинка поворачивается по EXIF, а сам EXIF выбрасывается"""
+        form = self.submit(make_image((40, 20), orientation=6))
+        self.assertTrue(form.is_valid(), form.errors)
+        stored = self.stored(form)
+        self.assertEqual(stored.size, (20, 40))
+        self.assertNotIn('exif', stored.info)
+
+    def test_small_image_kept_as_is(self):
+        """Картинку, которой ничего не нужно, не перекодируем"""
+        upload = make_image((40, 20), 'PNG')
+        form = self.submit(upload)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertIs(form.cleaned_data['image'], upload)
+
+    @override_settings(
+        IMAGE_UPLOAD_MAX_DIMENSION=50, IMAGE_UPLOAD_MEMORY_LIMIT=100_000
+    )
+    def test_memory_limit(self):
+        """Без уменьшенного декодирования картинка должна влезать в бюджет"""
+        form = self.submit(make_image((400, 200), 'PNG'))
+        self.assertEqual(form.errors.as_data()['image'][0].code, 'too_large')
+        form = self.submit(make_image((1600, 800)))
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(self.stored(form).size, (50, 25))
+
+    @override_settings(IMAGE_UPLOAD_MAX_DIMENSION=50)
+    def test_truncated_image_is_form_error(self):
+        """Обрезанный JPEG — ошибка формы, а не 500"""
+        upload = make_image((400, 200))
+        content = upload.read()
+        truncated = SimpleUploadedFile(
+            'photo.jpg', content[:len(content) // 2],
+            content_type='image/jpeg',
+        )
+        form = self.submit(truncated)
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'invalid_image'
+        )
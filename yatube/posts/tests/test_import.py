@@ -0,0 +1,236 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from posts.models import (Comment, Follow, Group, Post, StoredImage,
+                          TimelineEntry, User, UserStats)
+from posts.search import Search, SearchPaginator
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportDataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def jsonl(self, name, rows):
+        return self.write(
+            name, '\n'.join(json.dumps(row, ensure_ascii=False)
+                            for row in rows)
+        )
+
+    def run_import(self, path, model, *args):
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_data', path, f'--model={model}', '--batch-size=2',
+            *args, stdout=out, stderr=err,
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_posts(self):
+        """Посты из JSONL пишутся со счётчиками, лентами и поиском"""
+        path = self.jsonl('posts.jsonl', [
+            {'text': 'Первый ёжик', 'author': 'author', 'group': 'group',
+             'pub_date': '2020-01-02T03:04:05'},
+            {'text': 'Второй', 'author': 'author'},
+            {'text': 'Третий', 'author': 'author', 'group': 'nope'},
+            {'author': 'author'},
+        ])
+        out, err = self.run_import(path, 'post')
+        self.assertIn('строк/с', out)
+        self.assertIn('пропущено строк: 2', out)
+        self.assertIn('Строка 3', err)
+        self.assertIn('Строка 4', err)
+        first = Post.objects.get(text='Первый ёжик')
+        self.assertEqual(first.pub_date.year, 2020)
+        self.assertEqual(first.group, self.group)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 2
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        page = SearchPaginator(
+            Search('"ежик"', None, None), 10
+        ).get_page()
+        self.assertEqual([post.pk for post in page], [first.pk])
+
+    def test_posts_with_images(self):
+        """Картинки берутся из каталога и учитываются в ссылках"""
+        with open(os.path.join(self.directory, 'small.gif'), 'wb') as file:
+            file.write(SMALL_GIF)
+        path = self.jsonl('posts.jsonl', [
+            {'text': 'Раз', 'author': 'author', 'image': 'small.gif'},
+            {'text': 'Два', 'author': 'author', 'image': 'small.gif'},
+            {'text': 'Три', 'author': 'author', 'image': 'missing.gif'},
+        ])
+        self.run_import(path, 'post', f'--images={self.directory}')
+        names = set(
+            Post.objects.exclude(image='').values_list('image', flat=True)
+        )
+        self.assertEqual(len(names), 1)
+        self.assertEqual(StoredImage.objects.get(name=names.pop()).refs, 2)
+        self.assertFalse(Post.objects.filter(text='Три').exists())
+
+    def test_bad_rows_do_not_abort_import(self):
+        """Не картинка и занятый id пропускаются, остальное пишется"""
+        taken = Post.objects.create(text='Уже есть', author=self.author)
+        self.write('broken.gif', 'не картинка')
+        path = self.jsonl('posts.jsonl', [
+            {'text': 'До', 'author': 'author'},
+            {'text': 'Битая', 'author': 'author', 'image': 'broken.gif'},
+            {'id': 500, 'text': 'Свой id', 'author': 'author'},
+            {'id': 500, 'text': 'Повтор id', 'author': 'author'},
+            {'id': taken.pk, 'text': 'Дубль', 'author': 'author'},
+            {'text': 'После', 'author': 'author'},
+        ])
+        out, err = self.run_import(path, 'post', f'--images={self.directory}')
+        self.assertIn('пропущено строк: 3', out)
+        self.assertIn('Строка 2', err)
+        self.assertIn(f'Пост {taken.pk}: id уже занят', err)
+        self.assertEqual(
+            set(Post.objects.values_list('text', flat=True)),
+            {'Уже есть', 'До', 'Свой id', 'После'},
+        )
+
+    def test_comments_csv_with_threads(self):
+        """Комментарии из CSV: ответы получают пути родителей"""
+        post = Post.objects.create(text='Пост', author=self.author)
+        path = self.write('comments.csv', (
+            'id,post,parent,author,text,created\n'
+            f'100,{post.pk},,reader,Корень,2020-01-01T00:00:00\n'
+            f'101,{post.pk},100,author,Ответ,\n'
+            f'102,{post.pk},101,reader,Ответ на ответ,\n'
+            f',{post.pk},999,reader,Сирота,\n'
+            f',{post.pk},,newbie,Новичок,\n'
+        ))
+        out, err = self.run_import(path, 'comment', '--create-users')
+        self.assertIn('999', err)
+        paths = dict(Comment.objects.values_list('text', 'path'))
+        self.assertEqual(paths['Корень'], '0000000100/')
+        self.assertEqual(
+            paths['Ответ на ответ'], '0000000100/0000000101/0000000102/'
+        )
+        self.assertTrue(paths['Новичок'])
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 4)
+        self.assertEqual(
+            Comment.objects.get(text='Корень').created.year, 2020
+        )
+        self.assertTrue(User.objects.filter(username='newbie').exists())
+
+    def test_export_round_trip(self):
+        """Выгрузка export_data импортируется обратно: посты, затем ответы"""
+        post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group
+        )
+        root = Comment.objects.create(
+            post=post, author=self.reader, text='Корень'
+        )
+        Comment.objects.create(
+            post=post, author=self.author, text='Ответ', parent=root
+        )
+        for file_format in ('jsonl', 'csv'):
+            with self.subTest(file_format=file_format):
+                path = os.path.join(self.directory, f'export.{file_format}')
+                call_command(
+                    'export_data', '--profile=author', output=path,
+                    file_format=file_format, stderr=StringIO(),
+                )
+                Post.objects.all().delete()
+                out, err = self.run_import(path, 'post')
+                self.assertEqual(err, '')
+                self.assertIn('строк другого типа: 2', out)
+                out, err = self.run_import(path, 'comment')
+                self.assertEqual(err, '')
+                self.assertIn('строк другого типа: 1', out)
+                self.assertEqual(
+                    list(Post.objects.values_list('pk', 'text', 'group')),
+                    [(post.pk, 'Пост', self.group.pk)],
+                )
+                self.assertEqual(
+                    list(Comment.objects.order_by('path').values_list(
+                        'text', 'parent'
+                    )),
+                    [('Корень', None), ('Ответ', root.pk)],
+                )
+                self.assertEqual(
+                    Post.objects.get(pk=post.pk).comments_count, 2
+                )
+
+    def test_write_lock_before_reading_ids(self):
+        """Блокировка записи берётся до чтения занятых id"""
+        path = self.jsonl('posts.jsonl', [
+            {'id': 500, 'text': 'С id', 'author': 'author'},
+            {'text': 'Без id', 'author': 'author'},
+        ])
+        with CaptureQueriesContext(connection) as captured:
+            self.run_import(path, 'post')
+        queries = [query['sql'] for query in captured.captured_queries]
+        lock = next((
+            number for number, sql in enumerate(queries)
+            if sql.startswith('UPDATE "posts_post"')
+        ), None)
+        self.assertIsNotNone(lock, 'нет записи, берущей блокировку')
+        for sql in queries[:lock]:
+            self.assertNotIn('MAX(', sql)
+            self.assertFalse(sql.startswith('SELECT "posts_post"."id"'))
+        self.assertEqual(Post.objects.get(text='Без id').pk, 501)
+
+    def test_follows(self):
+        """Подписки без дублей, со счётчиками и бэкфиллом ленты"""
+        Post.objects.create(text='Пост', author=self.reader)
+        path = self.jsonl('follows.jsonl', [
+            {'user': 'author', 'author': 'reader'},
+            {'user': 'author', 'author': 'reader'},
+            {'user': 'reader', 'author': 'author'},
+            {'user': 'author', 'author': 'author'},
+        ])
+        self.run_import(path, 'follow')
+        self.assertEqual(Follow.objects.count(), 2)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).followers_count, 1
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.author).count(), 1
+        )
@@ -63,3 +63,16 @@ class PostsModelTest(TestCase):
             ('group', 'Группа, к которой будет относиться пост'),
         ]
         self.check_text(field_help_texts, False)
+
+    def test_deferred_fields_not_loaded_by_signals(self):
+        """Посты из .only() загружаются одним запросом, без дозагрузки."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {number}')
+            for number in range(5)
+        )
+        with self.assertNumQueries(1):
+            posts = list(Post.objects.only('id'))
+        self.assertEqual(len(posts), 6)
+        with self.assertNumQueries(1):
+            list(Post.objects.only('text', 'author__username')
+                 .select_related('author'))
@@ -1,5 +1,8 @@
 from django.conf import settings
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from posts.models import Group, Post, User
 
@@ -32,6 +35,7 @@ class PaginatorViewsTest(TestCase):
                             * settings.COUNT_POST)
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user_author)
 
@@ -53,9 +57,105 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(
                     response.context['page_obj']
                 ), settings.COUNT_POST)
+                next_cursor = response.context['page_obj'].next_cursor
                 response = self.authorized_client.get(
-                    url_page + f'?page={self.PAGE_NUMBER}'
+                    url_page, {'after': next_cursor}
                 )
                 self.assertEqual(len(
                     response.context['page_obj']
                 ), self.SECOND_POSTS)
+                self.assertEqual(
+                    response.context['page_obj'].number, self.PAGE_NUMBER
+                )
+
+    def test_cursor_navigation(self):
+        """Курсоры ведут на соседние страницы без пропусков и повторов"""
+        url_page = reverse('posts:index')
+        first_page = self.authorized_client.get(url_page).context['page_obj']
+        self.assertFalse(first_page.has_previous())
+        second_page = self.authorized_client.get(
+            url_page, {'after': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertFalse(second_page.has_next())
+        self.assertFalse(
+            set(first_page.object_list) & set(second_page.object_list)
+        )
+        back_page = self.authorized_client.get(
+            url_page, {'before': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(back_page.object_list, first_page.object_list)
+        self.assertEqual(back_page.number, 1)
+
+    def test_broken_cursor(self):
+        """Битый курсор открывает первую страницу"""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'after': 'broken'}
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(
+            len(response.context['page_obj']), settings.COUNT_POST
+        )
+
+    @override_settings(COUNT_POST=2)
+    def test_sliding_window(self):
+        """Окно ссылок ограничено соседними страницами и ведёт
+        на те же записи, что и постраничный OFFSET"""
+        url_page = reverse('posts:index')
+        ordered = list(Post.objects.order_by('-pub_date', '-pk'))
+        page_obj = self.authorized_client.get(url_page).context['page_obj']
+        self.assertEqual(
+            [number for number, _ in page_obj.window], [1, 2, 3]
+        )
+        query = dict(page_obj.window)[3]
+        page_obj = self.authorized_client.get(
+            f'{url_page}?{query}'
+        ).context['page_obj']
+        self.assertEqual(page_obj.number, 3)
+        self.assertEqual(list(page_obj), ordered[4:6])
+        self.assertEqual(
+            [number for number, _ in page_obj.window], [1, 2, 3, 4, 5]
+        )
+        for number, query in page_obj.window:
+            if query is None:
+                continue
+            with self.subTest(number=number):
+                linked = self.authorized_client.get(
+                    f'{url_page}?{query}'
+                ).context['page_obj']
+                self.assertEqual(linked.number, number)
+                self.assertEqual(
+                    list(linked), ordered[(number - 1) * 2:number * 2]
+                )
+
+    @override_settings(COUNT_POST=2)
+    def test_last_page(self):
+        """Последняя страница открывается без OFFSET и с оценкой номера"""
+        page_obj = self.authorized_client.get(
+            reverse('posts:index'), {'last': 1}
+        ).context['page_obj']
+        oldest = list(Post.objects.order_by('pub_date', 'pk')[:2])
+        self.assertEqual(list(page_obj), oldest[::-1])
+        self.assertEqual(page_obj.number, 7)
+        self.assertFalse(page_obj.has_next())
+
+    @override_settings(COUNT_POST=2)
+    def test_deep_page_costs_the_same(self):
+        """Число запросов не растёт с глубиной страницы"""
+        url_page = reverse('posts:index')
+        self.authorized_client.get(url_page)
+        page_obj = self.authorized_client.get(url_page).context['page_obj']
+        with CaptureQueriesContext(connection) as shallow:
+            self.authorized_client.get(
+                url_page, {'after': page_obj.next_cursor}
+            )
+        for _ in range(4):
+            page_obj = self.authorized_client.get(
+                url_page, {'after': page_obj.next_cursor}
+            ).context['page_obj']
+        cache.clear()
+        self.authorized_client.get(url_page)
+        with CaptureQueriesContext(connection) as deep:
+            self.authorized_client.get(
+                url_page, {'after': page_obj.next_cursor}
+            )
+        self.assertEqual(len(deep), len(shallow))
@@ -0,0 +1,80 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class QueryPlanTests(TestCase):
+    """Запросы страниц идут по составным индексам, а не перебором."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def plans(self, url, table):
+        """EXPLAIN QUERY PLAN каждого запроса страницы к таблице."""
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in captured.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or f'"{table}"' not in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans.append(' | '.join(row[-1] for row in cursor.fetchall()))
+        return plans
+
+    def assertUsesIndex(self, url, table, index):
+        plans = self.plans(url, table)
+        self.assertTrue(
+            any(index in plan for plan in plans),
+            f'{url}: {index} не используется:\n' + '\n'.join(plans),
+        )
+
+    def test_profile_posts(self):
+        """Посты автора — по (author, pub_date)"""
+        self.assertUsesIndex(
+            reverse('posts:profile', args=[self.author.username]),
+            'posts_post', 'post_author_date_idx',
+        )
+
+    def test_group_posts(self):
+        """Посты группы — по (group, pub_date)"""
+        self.assertUsesIndex(
+            reverse('posts:group_list', args=[self.group.slug]),
+            'posts_post', 'post_group_date_idx',
+        )
+
+    def test_comments(self):
+        """Комментарии поста — по (post, created)"""
+        self.assertUsesIndex(
+            reverse('posts:comments', args=[self.post.pk]),
+            'posts_comment', 'comment_post_created_idx',
+        )
+
+    def test_following_check(self):
+        """«Подписан ли» — по уникальному индексу (user, author)"""
+        self.client.force_login(self.reader)
+        self.assertUsesIndex(
+            reverse('posts:profile', args=[self.author.username]),
+            'posts_follow', 'sqlite_autoindex_posts_follow',
+        )
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Group, Post, User
+
+URL = reverse('posts:search')
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.strong = Post.objects.create(
+            text='Ёжик ёжик ёжик в тумане', author=cls.author,
+            group=cls.group,
+        )
+        cls.weak = Post.objects.create(
+            text='Ежик и лошадь, и ещё много других слов про лес и туман',
+            author=cls.other,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def search(self, **params):
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200)
+        page = response.context['page_obj']
+        return [post.pk for post in page] if page is not None else None
+
+    def test_ranked_by_relevance(self):
+        """Пост, где слово встречается чаще, выше в выдаче"""
+        self.assertEqual(
+            self.search(q='ежик'), [self.strong.pk, self.weak.pk]
+        )
+
+    def test_yo_matches_ye(self):
+        """«ё» и «е» в запросе и тексте не различаются"""
+        self.assertEqual(len(self.search(q='ЁЖИК')), 2)
+        self.assertEqual(self.search(q='еще'), [self.weak.pk])
+
+    def test_filters(self):
+        """Поиск сужается группой и автором"""
+        self.assertEqual(
+            self.search(q='ежик', group=self.group.slug), [self.strong.pk]
+        )
+        self.assertEqual(
+            self.search(q='ежик', author=self.other.username), [self.weak.pk]
+        )
+
+    def test_unknown_author_is_form_error(self):
+        """Несуществующий автор — ошибка формы, а не пустая выдача"""
+        response = self.client.get(URL, {'q': 'ежик', 'author': 'nobody'})
+        self.assertTrue(response.context['form'].errors)
+        self.assertIsNone(response.context['page_obj'])
+
+    def test_fts_syntax_is_not_error(self):
+        """Кавычки и операторы FTS5 в запросе не ломают поиск"""
+        for query in ('"', 'ежик OR', 'NEAR(', '*'):
+            with self.subTest(query=query):
+                self.search(q=query)
+
+    def test_index_follows_writes(self):
+        """Правка, update() и удаление поста сразу видны в поиске"""
+        post = Post.objects.get(pk=self.strong.pk)
+        post.text = 'Про котов'
+        post.save()
+        self.assertEqual(self.search(q='ежик'), [self.weak.pk])
+        self.assertEqual(self.search(q='котов'), [post.pk])
+        Post.objects.filter(pk=self.weak.pk).update(text='Про собак')
+        self.assertEqual(self.search(q='ежик'), [])
+        post.delete()
+        self.assertEqual(self.search(q='котов'), [])
+
+
+class SearchPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.ALL_POSTS: int = settings.COUNT_POST + 3
+        Post.objects.bulk_create(
+            Post(text=f'Туман {"туман " * number}', author=cls.author)
+            for number in range(cls.ALL_POSTS)
+        )
+
+    def test_pages_by_cursor(self):
+        """Следующая страница продолжает выдачу без повторов и пропусков"""
+        client = Client()
+        first = client.get(URL, {'q': 'туман'}).context['page_obj']
+        self.assertEqual(len(first), settings.COUNT_POST)
+        self.assertIn('q=', first.base_query)
+        second = client.get(
+            URL, {'q': 'туман', 'after': first.next_cursor}
+        ).context['page_obj']
+        seen = [post.pk for post in first] + [post.pk for post in second]
+        self.assertEqual(len(set(seen)), self.ALL_POSTS)
+        scores = [post.score for post in first] + [
+            post.score for post in second
+        ]
+        self.assertEqual(scores, sorted(scores))
+        previous = client.get(
+            URL, {'q': 'туман', 'before': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            [post.pk for post in previous], [post.pk for post in first]
+        )
@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from posts import thumbnails
+from posts.models import ImageVariant, Post, StoredImage, User
+from sorl.thumbnail import default
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF[:-3] + b'\x0B\x00\x3B'
+
+CARD = 'card-960-jpeg'
+
+
+def uploaded(name, content=SMALL_GIF):
+    return SimpleUploadedFile(name, content, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.storage = Post._meta.get_field('image').storage
+
+    def create(self, name, content=SMALL_GIF):
+        return Post.objects.create(
+            text='Пост', author=self.user, image=uploaded(name, content)
+        )
+
+    def refs(self, name):
+        return (
+            StoredImage.objects.filter(name=name)
+            .values_list('refs', flat=True).first()
+        )
+
+    def test_same_bytes_stored_once(self):
+        """Одинаковые картинки лежат в одном файле и делят миниатюры"""
+        first = self.create('first.gif')
+        second = self.create('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.refs(first.image.name), 2)
+        thumbnails.generate(first.pk)
+        self.assertIsNotNone(thumbnails.lookup(second.image, CARD))
+
+    def test_file_removed_with_last_reference(self):
+        """Файл и его миниатюры удаляются вместе с последним постом"""
+        first = self.create('first.gif')
+        second = self.create('second.gif')
+        name = first.image.name
+        thumbnails.generate(first.pk)
+        card = thumbnails.lookup(first.image, CARD)
+        first.delete()
+        self.assertEqual(self.refs(name), 1)
+        self.assertTrue(self.storage.exists(name))
+        second.delete()
+        self.assertIsNone(self.refs(name))
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(card.exists())
+        self.assertFalse(ImageVariant.objects.filter(source=name).exists())
+
+    def test_replaced_image_released(self):
+        """Замена картинки снимает ссылку со старого файла"""
+        post = self.create('first.gif')
+        old = post.image.name
+        post.image = uploaded('other.gif', OTHER_GIF)
+        post.save()
+        self.assertNotEqual(post.image.name, old)
+        self.assertEqual(self.refs(post.image.name), 1)
+        self.assertFalse(self.storage.exists(old))
+
+    def test_reconcile_image_refs(self):
+        """reconcile_counters чинит разошедшиеся ссылки на картинки"""
+        post = self.create('first.gif')
+        StoredImage.objects.update(refs=5)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.refs(post.image.name), 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class MediaGarbageCollectorTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.storage = Post._meta.get_field('image').storage
+        self.post = Post.objects.create(
+            text='Пост', author=self.user, image=uploaded('first.gif')
+        )
+        thumbnails.generate(self.post.pk)
+        self.card = thumbnails.lookup(self.post.image, CARD)
+        self.orphan = self.storage.save(
+            'posts/orphan.gif', ContentFile(OTHER_GIF)
+        )
+        self.stale = default.storage.save(
+            'cache/zz/zz/stale.jpg', ContentFile(b'jpeg')
+        )
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def gc(self, *args):
+        call_command(
+            'gc_media', '--sleep=0', *args, stdout=StringIO()
+        )
+
+    def test_orphans_removed(self):
+        """Удаляются только файлы без поста и миниатюры без записи sorl"""
+        self.gc('--min-age=0')
+        self.assertFalse(self.storage.exists(self.orphan))
+        self.assertFalse(default.storage.exists(self.stale))
+        self.assertTrue(self.storage.exists(self.post.image.name))
+        self.assertTrue(self.card.exists())
+
+    def test_fresh_files_kept(self):
+        """Свежие файлы могут принадлежать ещё не сохранённому посту"""
+        self.gc()
+        self.assertTrue(self.storage.exists(self.orphan))
+        self.assertTrue(default.storage.exists(self.stale))
+
+    def test_incremental_runs(self):
+        """С --limit обход продолжается с места остановки"""
+        state = os.path.join(TEMP_MEDIA_ROOT, settings.MEDIA_GC_STATE)
+        self.gc('--min-age=0', '--limit=1', '--batch-size=1')
+        self.assertTrue(os.path.exists(state))
+        for _ in range(10):
+            if not os.path.exists(state):
+                break
+            self.gc('--min-age=0', '--limit=1', '--batch-size=1')
+        self.assertFalse(os.path.exists(state))
+        self.assertFalse(self.storage.exists(self.orphan))
+        self.assertFalse(default.storage.exists(self.stale))
+        self.assertTrue(self.storage.exists(self.post.image.name))
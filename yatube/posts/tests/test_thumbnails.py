@@ -0,0 +1,206 @@
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from posts import thumbnails
+from posts.models import ImageVariant, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+CARD = 'card-960-jpeg'
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой', author=cls.user, image=uploaded()
+        )
+        cls.others = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.user,
+                image=uploaded(f'other{number}.gif'),
+            )
+            for number in range(3)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_templates_only_read_stored_thumbnails(self):
+        """Пока миниатюры нет, страница не генерирует её и отдаёт оригинал"""
+        response = Client().get(reverse('posts:index'))
+        self.assertIsNone(thumbnails.lookup(self.post.image, CARD))
+        self.assertContains(response, self.post.image.url)
+
+    def test_generate_prepares_all_geometries(self):
+        """generate готовит каждую миниатюру и сбрасывает кэш ленты"""
+        index = Client().get(reverse('posts:index'))
+        self.assertEqual(
+            thumbnails.generate(self.post.pk),
+            len(thumbnails.geometries()),
+        )
+        for name in thumbnails.geometries():
+            self.assertIsNotNone(thumbnails.lookup(self.post.image, name))
+        response = Client().get(reverse('posts:index'))
+        self.assertNotEqual(response['ETag'], index['ETag'])
+        self.assertContains(
+            response, thumbnails.lookup(self.post.image, CARD).url
+        )
+
+    def test_page_resolves_thumbnails_in_one_batch(self):
+        """Миниатюры всей страницы читаются одним запросом, потом из кэша"""
+        posts = [self.post, *self.others]
+        for post in posts:
+            thumbnails.generate(post.pk)
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.attach(posts)
+        with self.assertNumQueries(0):
+            thumbnails.attach(posts)
+        card = thumbnails.lookup(self.post.image, CARD)
+        self.assertEqual(
+            self.post.thumbnails[CARD],
+            thumbnails.Thumbnail(card.url, card.width, card.height),
+        )
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(
+            response, f'width="{card.width}" height="{card.height}"'
+        )
+
+    @override_settings(
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }},
+        THUMBNAIL_MISS_TIMEOUT=0.1,
+    )
+    def test_missing_thumbnail_is_not_remembered_for_long(self):
+        """Миниатюру, приготовленную другим процессом, видно через секунды"""
+        thumbnails.attach([self.post])
+        self.assertEqual(self.post.thumbnails, {})
+        # У другого процесса свой кэш: записи в нём отсюда не видны.
+        with self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'other-process',
+        }}):
+            thumbnails.generate(self.post.pk)
+        time.sleep(0.2)
+        thumbnails.attach([self.post])
+        self.assertIn(CARD, self.post.thumbnails)
+
+    def test_variants_record_sizes(self):
+        """Для каждого варианта записываются размеры и вес в байтах"""
+        thumbnails.generate(self.post.pk)
+        variants = ImageVariant.objects.filter(source=self.post.image.name)
+        self.assertEqual(
+            set(variants.values_list('name', flat=True)),
+            set(thumbnails.geometries()),
+        )
+        for variant in variants:
+            self.assertGreater(variant.size, 0)
+            self.assertEqual(variant.source_size, self.post.image.size)
+
+    def test_unsupported_formats_are_skipped(self):
+        """Форматы, которые Pillow не умеет сохранять, не генерируются"""
+        geometries = {
+            'card-960-nope': ('960x339', {'format': 'NOPE'}),
+            CARD: ('960x339', {'format': 'JPEG'}),
+        }
+        with self.settings(THUMBNAIL_GEOMETRIES=geometries):
+            self.assertEqual(list(thumbnails.geometries()), [CARD])
+
+    @override_settings(
+        THUMBNAIL_CARD_FORMATS=('PNG', 'JPEG'),
+        THUMBNAIL_GEOMETRIES={
+            f'card-{width}-{image_format.lower()}': (
+                f'{width}x{width * 339 // 960}',
+                {'crop': 'center', 'format': image_format},
+            )
+            for image_format in ('PNG', 'JPEG')
+            for width in (480, 960)
+        },
+    )
+    def test_picture_lists_formats_and_widths(self):
+        """<picture> даёт source на каждый формат и srcset по ширинам"""
+        found = {
+            f'card-{width}-{image_format}': thumbnails.Thumbnail(
+                f'/{width}.{image_format}', width, width * 339 // 960
+            )
+            for image_format in ('png', 'jpeg')
+            for width in (480, 960)
+        }
+        picture = thumbnails.picture(found)
+        self.assertEqual(picture.sources, [
+            thumbnails.Source('image/png', '/480.png 480w, /960.png 960w'),
+        ])
+        self.assertEqual(picture.img, found['card-960-jpeg'])
+        self.assertEqual(picture.srcset, '/480.jpeg 480w, /960.jpeg 960w')
+        self.assertIsNone(thumbnails.picture({}))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailScheduleTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.client.force_login(self.user)
+
+    def test_upload_schedules_thumbnails(self):
+        """Создание и правка поста с картинкой готовят миниатюры сразу"""
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Новый пост', 'image': uploaded()},
+        )
+        post = Post.objects.get()
+        self.assertIsNotNone(thumbnails.lookup(post.image, CARD))
+        self.client.post(
+            reverse('posts:edit', kwargs={'post_id': post.pk}),
+            {'text': 'Новый пост', 'image': uploaded('other.gif')},
+        )
+        post.refresh_from_db()
+        self.assertIsNotNone(thumbnails.lookup(post.image, CARD))
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_shutdown_drains_pool(self):
+        """shutdown() дожидается миниатюр, поставленных в пул"""
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Новый пост', 'image': uploaded()},
+        )
+        thumbnails.shutdown()
+        post = Post.objects.get()
+        self.assertIsNotNone(thumbnails.lookup(post.image, CARD))
@@ -1,17 +1,41 @@
+import multiprocessing
 import shutil
 import tempfile
+from http import HTTPStatus
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.conf import settings
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
+from core.cache_backends import SQLiteCache
 from posts.models import Group, Post, User
 from posts.forms import PostForm
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
+# Кэш проекта без задержки локального уровня.
+FRESH_CACHES = {
+    **settings.CACHES,
+    'default': {
+        **settings.CACHES['default'],
+        'OPTIONS': {
+            **settings.CACHES['default'].get('OPTIONS', {}),
+            'LOCAL_TIMEOUT': 0,
+        },
+    },
+}
+
+
+def bump_index():
+    """Сброс из другого процесса — как после manage.py import_data."""
+    SQLiteCache(settings.CACHES['shared']['LOCATION'], {}).incr(
+        'version:index'
+    )
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostsViewsTests(TestCase):
@@ -82,7 +106,7 @@ class PostsViewsTests(TestCase):
     def test_cache(self):
         """Тестирование кеша"""
         get_posts = self.authorized_client.get(reverse('posts:index')).content
-        Post.objects.all().delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Обход сигналов')
         get_cache_posts = self.authorized_client.get(
             reverse('posts:index')
         ).content
@@ -93,6 +117,148 @@ class PostsViewsTests(TestCase):
         ).content
         self.assertNotEqual(get_cache_posts, get_posts_after_clear_cache)
 
+    def test_cache_invalidation(self):
+        """Сохранение постов, комментариев и групп сбрасывает кеш"""
+        index = reverse('posts:index')
+        group_page = reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug}
+        )
+        changes = [
+            (index, lambda: Post.objects.create(
+                text='Новый пост', author=self.user_author
+            ), 'Новый пост'),
+            (group_page, lambda: self.post.comments.create(
+                text='Комментарий', author=self.user_author
+            ), 'Комментариев: 1'),
+            (group_page, lambda: Group.objects.filter(
+                pk=self.group.pk
+            ).first().save(), 'Заголовок без сигналов'),
+        ]
+        for url, change, expected in changes:
+            with self.subTest(url=url, expected=expected):
+                self.authorized_client.get(url)
+                Group.objects.filter(pk=self.group.pk).update(
+                    title='Заголовок без сигналов'
+                )
+                change()
+                response = self.authorized_client.get(url)
+                self.assertContains(response, expected)
+                Group.objects.filter(pk=self.group.pk).update(
+                    title=self.group.title
+                )
+
+    def test_cache_invalidation_on_delete(self):
+        """Удалённый пост сразу пропадает с главной страницы"""
+        post = Post.objects.create(
+            text='Удаляемый пост', author=self.user_author
+        )
+        index = reverse('posts:index')
+        self.assertContains(self.authorized_client.get(index), post.text)
+        post.delete()
+        self.assertNotContains(self.authorized_client.get(index), post.text)
+
+    def test_cache_survives_unrelated_changes(self):
+        """Изменения в одной группе не сбрасывают кеш другой"""
+        other_post = Post.objects.create(
+            text='Пост второй группы',
+            author=self.user_author,
+            group=self.second_group,
+        )
+        url = reverse(
+            'posts:group_list', kwargs={'slug': self.second_group.slug}
+        )
+        self.authorized_client.get(url)
+        Post.objects.filter(pk=other_post.pk).update(text='Обход сигналов')
+        Post.objects.create(
+            text='Пост первой группы', author=self.user_author,
+            group=self.group,
+        )
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Пост второй группы')
+
+    def test_conditional_get(self):
+        """Неизменившаяся страница отдаётся ответом 304 без запросов
+        к постам, а любое изменение меняет ETag"""
+        for url, _ in self.URLS:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                etag = response['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                # Сессия, пользователь и поиск id группы, автора или поста.
+                self.assertLessEqual(len(queries), 3)
+                self.post.comments.create(
+                    text='Комментарий', author=self.user_author
+                )
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_user(self):
+        """Разные пользователи получают разные ETag"""
+        url = reverse('posts:index')
+        etag = self.authorized_client.get(url)['ETag']
+        response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_changes_after_new_login(self):
+        """После нового входа страница не отдаётся 304 со старым токеном"""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.authorized_client.get(url)['ETag']
+        self.authorized_client.logout()
+        self.authorized_client.force_login(self.user_author)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_anonymous_page_cache(self):
+        """Анонимам страницы отдаются из кеша до изменения данных"""
+        guest_client = Client()
+        for url, _ in self.URLS:
+            with self.subTest(url=url):
+                guest_client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = guest_client.get(url)
+                self.assertIsNone(response.context)
+                self.assertLessEqual(len(queries), 1)
+                self.post.comments.create(
+                    text='Свежий комментарий', author=self.user_author
+                )
+                response = guest_client.get(url)
+                self.assertIsNotNone(response.context)
+                response = guest_client.get(url, {'after': 'other'})
+                self.assertIsNotNone(response.context)
+
+    @override_settings(CACHES=FRESH_CACHES)
+    def test_anonymous_page_sees_bump_from_other_process(self):
+        """Сброс версии в другом процессе виден анонимной странице"""
+        guest_client = Client()
+        url = reverse('posts:index')
+        guest_client.get(url)
+        # bulk_create не шлёт сигналов: пост записал другой процесс.
+        Post.objects.bulk_create(
+            [Post(text='Импортированный пост', author=self.user_author)]
+        )
+        self.assertNotContains(guest_client.get(url), 'Импортированный пост')
+        worker = multiprocessing.get_context('fork').Process(
+            target=bump_index
+        )
+        worker.start()
+        worker.join()
+        self.assertContains(guest_client.get(url), 'Импортированный пост')
+
+    def test_authorized_pages_are_not_cached(self):
+        """Авторизованный пользователь всегда получает свежую страницу"""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertIsNotNone(response.context)
+
     def check_create_edit_post(self, response):
         """Проверяем, что в форму передан правильный контекст"""
         field_form = response.context['form']
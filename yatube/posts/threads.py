@@ -0,0 +1,81 @@
+from django.conf import settings
+
+from .models import Comment
+
+# Ширина id в пути: пути сравниваются как строки, поэтому порядок
+# путей совпадает с обходом дерева в глубину.
+WIDTH = 10
+STEP = WIDTH + 1
+# Больше любого символа пути: path < prefix + END — вся ветка prefix.
+END = '~'
+
+
+def path_for(pk, parent_path=''):
+    return f'{parent_path}{pk:0{WIDTH}d}/'
+
+
+def assign_path(comment):
+    """Записывает путь только что созданного комментария."""
+    parent_path = comment.parent.path if comment.parent_id else ''
+    comment.path = path_for(comment.pk, parent_path)
+    Comment.objects.filter(pk=comment.pk).update(path=comment.path)
+
+
+def subtree(comment, after=None):
+    """Ответы в ветке comment в порядке обхода, одним запросом по индексу.
+
+    С after — только те, что идут после ответа с путём after.
+    """
+    return (
+        Comment.objects.select_related('author')
+        .filter(
+            post_id=comment.post_id,
+            path__gt=after or comment.path,
+            path__lt=comment.path + END,
+        )
+        .order_by('path')
+    )
+
+
+def attach(roots, limit=None):
+    """Добавляет корневым комментариям по limit первых ответов из ветки.
+
+    Все ветки страницы лежат в одном диапазоне путей, поэтому ответы
+    для них читаются одним запросом; ROW_NUMBER() оставляет не больше
+    limit ответов на ветку и ещё один — чтобы узнать, есть ли остальные.
+    Ставит comment.thread и comment.more_replies.
+    """
+    limit = limit or settings.COUNT_REPLIES
+    roots = list(roots)
+    for root in roots:
+        root.thread, root.more_replies = [], False
+    if not roots:
+        return roots
+    paths = [root.path for root in roots]
+    table = Comment._meta.db_table
+    first = (
+        f'{table}.id IN (SELECT id FROM (SELECT id, ROW_NUMBER() OVER ('
+        f'PARTITION BY substr(path, 1, {STEP}) ORDER BY path) AS number '
+        f'FROM {table} WHERE post_id = %s AND path > %s AND path < %s '
+        f'AND parent_id IS NOT NULL) AS thread WHERE number <= %s)'
+    )
+    by_root = {root.path: root for root in roots}
+    replies = (
+        Comment.objects.select_related('author')
+        .extra(
+            where=[first],
+            params=[
+                roots[0].post_id, min(paths), max(paths) + END, limit + 1,
+            ],
+        )
+        .order_by('path')
+    )
+    for reply in replies:
+        root = by_root.get(reply.path[:STEP])
+        if root is None:
+            continue
+        if len(root.thread) < limit:
+            root.thread.append(reply)
+        else:
+            root.more_replies = True
+    return roots
@@ -0,0 +1,311 @@
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections, transaction
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDB
+from sorl.thumbnail.models import KVStore
+
+from . import caching
+from .models import ImageVariant, Post, StoredImage
+
+logger = logging.getLogger(__name__)
+
+Thumbnail = namedtuple('Thumbnail', ('url', 'width', 'height'))
+Source = namedtuple('Source', ('type', 'srcset'))
+Picture = namedtuple('Picture', ('sources', 'img', 'srcset'))
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+def image_format(options):
+    return options.get('format', sorl_settings.THUMBNAIL_FORMAT)
+
+
+def geometries():
+    """THUMBNAIL_GEOMETRIES без форматов, которые Pillow не сохраняет."""
+    Image.init()
+    return {
+        name: (geometry, options)
+        for name, (geometry, options)
+        in settings.THUMBNAIL_GEOMETRIES.items()
+        if image_format(options) in Image.SAVE
+    }
+
+
+def thumbnail_file(image, name):
+    """ImageFile миниатюры name для image — тот же, что строит sorl.
+
+    Повторяет подстановку опций из ThumbnailBackend.get_thumbnail, чтобы
+    имя файла и ключ в хранилище совпадали с теми, что создаёт генерация.
+    """
+    geometry, options = settings.THUMBNAIL_GEOMETRIES[name]
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return ImageFile(
+        backend._get_thumbnail_filename(source, geometry, options),
+        default.storage,
+    )
+
+
+def lookup(image, name):
+    """Готовая миниатюра из хранилища sorl или None; ничего не генерирует."""
+    if not image:
+        return None
+    return default.kvstore.get(thumbnail_file(image, name))
+
+
+def _fetch_raw(keys):
+    """Сырые значения хранилища sorl: один get_many и один запрос к БД."""
+    kvstore = default.kvstore
+    if not keys:
+        return {}
+    if not isinstance(kvstore, CachedDB):
+        return {key: kvstore._get_raw(key) for key in keys}
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = dict(
+            KVStore.objects.filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        kvstore.cache.set_many(
+            stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        # Отсутствие ключа помним недолго: миниатюры готовятся уже после
+        # ответа, и часто в другом процессе.
+        absent = {key: EMPTY_VALUE for key in missing if key not in stored}
+        kvstore.cache.set_many(absent, settings.THUMBNAIL_MISS_TIMEOUT)
+        found.update(stored)
+        found.update(absent)
+    return found
+
+
+def resolve(images):
+    """Готовые миниатюры всех геометрий для набора картинок за раз.
+
+    Возвращает {(имя файла, имя геометрии): Thumbnail}; картинок без
+    готовой миниатюры в словаре нет.
+    """
+    keys = {}
+    for image in images:
+        if not image:
+            continue
+        for name in geometries():
+            keys[image.name, name] = add_prefix(
+                thumbnail_file(image, name).key
+            )
+    raw = _fetch_raw(list(set(keys.values())))
+    result = {}
+    for pair, key in keys.items():
+        value = raw.get(key)
+        if not value or value is EMPTY_VALUE:
+            continue
+        data = deserialize(value)
+        result[pair] = Thumbnail(
+            default.storage.url(data['name']), *data['size']
+        )
+    return result
+
+
+def _srcset(variants):
+    return ', '.join(f'{item.url} {item.width}w' for item in variants)
+
+
+def picture(found):
+    """Собирает <picture> из готовых вариантов {имя: Thumbnail}.
+
+    Каждый формат — отдельный <source> со srcset по ширинам; последний
+    из готовых форматов THUMBNAIL_CARD_FORMATS идёт в запасной <img>.
+    """
+    by_format = {}
+    for name, (geometry, options) in geometries().items():
+        if name in found:
+            by_format.setdefault(image_format(options), []).append(found[name])
+    formats = [
+        name for name in settings.THUMBNAIL_CARD_FORMATS if name in by_format
+    ]
+    if not formats:
+        return None
+    fallback = sorted(by_format[formats[-1]], key=lambda item: item.width)
+    img = next(
+        (item for item in fallback
+         if item.width >= settings.THUMBNAIL_CARD_SIZE[0]),
+        fallback[-1],
+    )
+    sources = [
+        Source(
+            f'image/{name.lower()}',
+            _srcset(sorted(by_format[name], key=lambda item: item.width)),
+        )
+        for name in formats[:-1]
+    ]
+    return Picture(sources, img, _srcset(fallback))
+
+
+def attach(posts):
+    """Проставляет постам готовые миниатюры и <picture> из них.
+
+    post.thumbnails — {имя геометрии: Thumbnail}, post.picture —
+    Picture или None, если ни одной миниатюры ещё нет.
+    """
+    posts = list(posts)
+    resolved = resolve(post.image for post in posts)
+    for post in posts:
+        post.thumbnails = {
+            name: resolved[post.image.name, name]
+            for name in geometries()
+            if post.image and (post.image.name, name) in resolved
+        }
+        post.picture = picture(post.thumbnails)
+    return posts
+
+
+def _record(image, variants):
+    """Запоминает размеры вариантов, чтобы считать сэкономленные байты."""
+    source_size = image.size
+    ImageVariant.objects.filter(source=image.name).delete()
+    ImageVariant.objects.bulk_create(
+        ImageVariant(
+            source=image.name,
+            name=name,
+            image_format=image_format(options),
+            width=thumbnail.width,
+            height=thumbnail.height,
+            size=default.storage.size(thumbnail.name),
+            source_size=source_size,
+        )
+        for name, options, thumbnail in variants
+    )
+
+
+def generate(post_id):
+    """Готовит все миниатюры поста и сбрасывает кэш страниц с ним."""
+    post = (
+        Post.objects.filter(pk=post_id)
+        .only('image', 'author_id', 'group_id')
+        .first()
+    )
+    if post is None or not post.image:
+        return 0
+    variants = [
+        (name, options, get_thumbnail(post.image, geometry, **options))
+        for name, (geometry, options) in geometries().items()
+    ]
+    _record(post.image, variants)
+    caching.bump(*caching.post_scopes(post.pk, post.author_id, post.group_id))
+    return len(variants)
+
+
+def discard(name):
+    """Удаляет файл, на который больше нет ссылок, и всё, что из него сделано.
+
+    Если за время до коммита на файл снова сослались, ничего не трогает.
+    """
+    if not StoredImage.objects.filter(name=name, refs=0).delete()[0]:
+        return False
+    drop(name)
+    return True
+
+
+def drop(name):
+    """Удаляет оригинал, его миниатюры и все записи о нём без проверок."""
+    storage = Post._meta.get_field('image').storage
+    default.kvstore.delete(ImageFile(name, storage))
+    ImageVariant.objects.filter(source=name).delete()
+    StoredImage.objects.filter(name=name).delete()
+    try:
+        storage.delete(name)
+    except SuspiciousFileOperation:
+        # Имя указывает за пределы MEDIA_ROOT: такой файл не наш.
+        logger.warning('image %s is outside of media storage', name)
+
+
+def known_thumbnails(names):
+    """Те из имён файлов миниатюр, что записаны в хранилище sorl."""
+    keys = {
+        add_prefix(ImageFile(name, default.storage).key): name
+        for name in names
+    }
+    raw = _fetch_raw(list(keys))
+    return {
+        name for key, name in keys.items()
+        if raw.get(key) and raw[key] is not EMPTY_VALUE
+    }
+
+
+def _pool():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+            _slots = threading.BoundedSemaphore(
+                settings.THUMBNAIL_QUEUE_SIZE
+            )
+    return _executor, _slots
+
+
+def shutdown(wait=True):
+    """Останавливает пул; с wait=True дожидается поставленных задач.
+
+    Следующий schedule() создаст пул заново.
+    """
+    global _executor, _slots
+    with _lock:
+        executor, _executor, _slots = _executor, None, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _run(post_id, slots):
+    try:
+        generate(post_id)
+    except Exception:
+        logger.exception('thumbnails for post %s failed', post_id)
+    finally:
+        slots.release()
+        connections.close_all()
+
+
+def _submit(post_id):
+    if not settings.THUMBNAIL_WORKERS:
+        generate(post_id)
+        return
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        # Очередь полна: пост покажет оригинал, пока миниатюры не
+        # догенерирует warm_thumbnails.
+        logger.warning('thumbnail queue is full, post %s skipped', post_id)
+        return
+    executor.submit(_run, post_id, slots)
+
+
+def schedule(post):
+    """Ставит генерацию миниатюр поста в очередь после коммита."""
+    if post.image:
+        transaction.on_commit(lambda: _submit(post.pk))
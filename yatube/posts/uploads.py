@@ -0,0 +1,109 @@
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+ORIENTATION = 0x0112
+
+# Одновременно в процессе декодируется не больше одной картинки, поэтому
+# на загрузки уходит не больше IMAGE_UPLOAD_MEMORY_LIMIT на воркер.
+_decoding = threading.Lock()
+
+
+def _check_header(image):
+    """Проверяет размеры по заголовку, не декодируя пиксели."""
+    width, height = image.size
+    if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка слишком большая: %(pixels)s пикселей при пределе '
+            '%(limit)s.',
+            code='decompression_bomb',
+            params={
+                'pixels': width * height,
+                'limit': settings.IMAGE_UPLOAD_MAX_PIXELS,
+            },
+        )
+
+
+def _needs_work(image):
+    too_big = max(image.size) > settings.IMAGE_UPLOAD_MAX_DIMENSION
+    return too_big or 'exif' in image.info
+
+
+def _decode(image):
+    """Декодирует картинку сразу в уменьшенном виде, если формат умеет.
+
+    JPEG через draft() распаковывается в 1/2–1/8 размера, остальные
+    форматы — целиком, поэтому для них проверяем бюджет памяти заранее.
+    """
+    limit = settings.IMAGE_UPLOAD_MAX_DIMENSION
+    if image.format == 'JPEG':
+        ratio = min(limit / max(image.size), 1)
+        image.draft(
+            'RGB' if image.mode != 'L' else 'L',
+            tuple(max(int(side * ratio), 1) for side in image.size),
+        )
+    width, height = image.size
+    if width * height * len(image.getbands()) > (
+        settings.IMAGE_UPLOAD_MEMORY_LIMIT
+    ):
+        raise ValidationError(
+            'Картинку такого размера не получится обработать, '
+            'уменьшите её перед загрузкой.',
+            code='too_large',
+        )
+    image.thumbnail((limit, limit), Image.LANCZOS)
+    result = ImageOps.exif_transpose(image)
+    # Без exif в info PNG и WebP не переносят метаданные при сохранении.
+    result.info.pop('exif', None)
+    return result
+
+
+def normalize(upload):
+    """Проверяет и приводит загруженную картинку к виду для хранения.
+
+    Отклоняет decompression bomb по заголовку, уменьшает картинку до
+    IMAGE_UPLOAD_MAX_DIMENSION по длинной стороне, поворачивает по
+    EXIF Orientation и выбрасывает EXIF. Картинки, которым ничего из
+    этого не нужно, возвращаются как есть, без перекодирования.
+    Повреждённый файл — ValidationError, а не ошибка сервера.
+    """
+    try:
+        return _normalize(upload)
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        # Обрезанный JPEG проходит verify() ImageField и ломается только
+        # при декодировании пикселей.
+        raise ValidationError(
+            'Не удалось прочитать картинку: файл повреждён.',
+            code='invalid_image',
+        ) from None
+
+
+def _normalize(upload):
+    upload.seek(0)
+    with Image.open(upload) as image:
+        _check_header(image)
+        if not _needs_work(image):
+            upload.seek(0)
+            return upload
+        if getattr(image, 'n_frames', 1) > 1:
+            raise ValidationError(
+                'Анимация слишком большая, уменьшите её перед загрузкой.',
+                code='too_large',
+            )
+        image_format = image.format
+        with _decoding:
+            result = _decode(image)
+    if image_format == 'JPEG' and result.mode not in ('RGB', 'L', 'CMYK'):
+        result = result.convert('RGB')
+    buffer = BytesIO()
+    result.save(
+        buffer, format=image_format, quality=settings.IMAGE_UPLOAD_QUALITY
+    )
+    return SimpleUploadedFile(
+        upload.name, buffer.getvalue(),
+        content_type=Image.MIME.get(image_format, upload.content_type),
+    )
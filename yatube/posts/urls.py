@@ -1,19 +1,40 @@
 from django.urls import path
-from posts.views import (add_comment, follow_index, group_posts, index,
-                         post_create, post_detail, post_edit, profile,
-                         profile_follow, profile_unfollow)
+from posts.feeds import (group_atom, group_rss, index_atom, index_rss,
+                         profile_atom, profile_rss)
+from posts.views import (add_comment, follow_index, group_export,
+                         group_posts, index, post_comments, post_create,
+                         post_detail, post_edit, post_search, profile,
+                         profile_export, profile_follow, profile_unfollow)
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', index, name='index'),
+    path('rss/', index_rss, name='index_rss'),
+    path('atom/', index_atom, name='index_atom'),
     path('group/<slug:slug>/', group_posts, name='group_list'),
+    path('group/<slug:slug>/rss/', group_rss, name='group_rss'),
+    path('group/<slug:slug>/atom/', group_atom, name='group_atom'),
+    path('group/<slug:slug>/export/', group_export, name='group_export'),
     path('profile/<str:username>/', profile, name='profile'),
+    path('profile/<str:username>/rss/', profile_rss, name='profile_rss'),
+    path('profile/<str:username>/atom/', profile_atom, name='profile_atom'),
+    path(
+        'profile/<str:username>/export/',
+        profile_export,
+        name='profile_export'
+    ),
     path('posts/<int:post_id>/', post_detail, name='post_detail'),
     path('create/', post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', post_edit, name='edit'),
     path('posts/<int:post_id>/comment/', add_comment, name='add_comment'),
+    path(
+        'posts/<int:post_id>/comments/',
+        post_comments,
+        name='comments'
+    ),
     path('follow/', follow_index, name='follow_index'),
+    path('search/', post_search, name='search'),
     path(
         'profile/<str:username>/follow/',
         profile_follow,
@@ -1,17 +1,41 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.exceptions import PermissionDenied
+from django.http import (Http404, HttpResponseBadRequest, JsonResponse,
+                         QueryDict, StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import condition
 
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from . import caching, export, feed, threads, thumbnails
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Comment, Follow, Group, Post, User
+from .paginator import (CommentPaginator, CursorPaginator,
+                        MergedCursorPaginator)
+from .search import Search, SearchPaginator, to_match
 
 
-def get_page(page_number, post_list):
-    paginator = Paginator(post_list, settings.COUNT_POST)
-    return paginator.get_page(page_number)
+def get_page(request, post_list, paginator_class=CursorPaginator, keep=(),
+             **kwargs):
+    paginator = paginator_class(post_list, settings.COUNT_POST, **kwargs)
+    page = paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        last='last' in request.GET,
+    )
+    thumbnails.attach(page.object_list)
+    # Параметры из keep переносятся в ссылки пагинатора.
+    kept = QueryDict(mutable=True)
+    for name in keep:
+        if name in request.GET:
+            kept.setlist(name, request.GET.getlist(name))
+    page.base_query = f'{kept.urlencode()}&' if kept else ''
+    return page
 
 
+@condition(etag_func=caching.index_etag)
+@caching.anonymous_page(caching.index_etag)
 def index(request):
     template = 'posts/index.html'
     title = 'Последние обновления на сайте'
@@ -19,38 +43,45 @@ def index(request):
     posts = (
         Post.objects.select_related('author', 'group')
     )
-    page_number = request.GET.get('page')
-    page_obj = get_page(page_number, posts)
+    page_obj = get_page(request, posts)
     context = {
         'title': title,
         'text': text,
         'page_obj': page_obj,
+        **caching.fragment('index'),
     }
 
     return render(request, template, context)
 
 
+@condition(etag_func=caching.group_etag)
+@caching.anonymous_page(caching.group_etag)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     title = f'Записи сообщества {slug}'
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related('author')
-    page_number = request.GET.get('page')
-    page_obj = get_page(page_number, posts)
+    page_obj = get_page(request, posts)
     context = {
         'title': title,
         'group': group,
         'page_obj': page_obj,
+        **caching.fragment(f'group:{group.pk}'),
     }
     return render(request, template, context)
 
 
+@condition(etag_func=caching.profile_etag)
+@caching.anonymous_page(caching.profile_etag)
 def profile(request, username):
     template = 'posts/profile.html'
-    profile = get_object_or_404(User, username=username)
+    profile = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
     post = profile.posts.select_related('group')
-    page_number = request.GET.get('page')
-    page_obj = get_page(page_number, post)
+    stats = getattr(profile, 'stats', None)
+    page_obj = get_page(request, post, total=stats and stats.posts_count)
     following = (
         request.user.is_authenticated
         and profile.following.filter(user=request.user).exists()
@@ -59,25 +90,175 @@ def profile(request, username):
         'profile': profile,
         'page_obj': page_obj,
         'following': following,
+        **caching.fragment(f'profile:{profile.pk}'),
     }
     return render(request, template, context)
 
 
+@condition(etag_func=caching.post_etag)
+@caching.anonymous_page(caching.post_etag)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
     detail = get_object_or_404(
-        Post.objects.select_related('author', 'group'),
+        Post.objects.select_related('author__stats', 'group'),
         id=post_id
     )
-    comments = detail.comments.select_related('author')
+    thumbnails.attach([detail])
+    reply = request.GET.get('reply', '')
     context = {
         'detail': detail,
         'form': CommentForm(),
-        'comments': comments,
+        'reply_to': reply if reply.isdigit() else None,
+        # Первая пачка читается из базы, только если её нет в кэше.
+        'comments': SimpleLazyObject(lambda: get_comments(detail)),
+        **caching.fragment(f'comments:{post_id}'),
     }
     return render(request, template, context)
 
 
+def get_comments(post, after=None):
+    """Пачка веток: корневые комментарии с первыми ответами."""
+    page = CommentPaginator(
+        post.comments.filter(parent=None).select_related('author'),
+        settings.COUNT_COMMENTS,
+        total=post.comments_count,
+    ).get_page(after=after)
+    threads.attach(page.object_list)
+    return page
+
+
+def comment_json(comment):
+    return {
+        'id': comment.pk,
+        'parent': comment.parent_id,
+        'depth': comment.depth,
+        'author': comment.author.username,
+        'author_name': comment.author.get_full_name(),
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+@condition(etag_func=caching.comments_etag)
+def post_comments(request, post_id):
+    """Следующая пачка веток или остаток одной ветки: HTML или JSON.
+
+    ?after=<курсор> — следующие корневые комментарии с первыми ответами,
+    ?thread=<id>[&after_path=<путь>] — ответы ветки id после after_path.
+    """
+    post = get_object_or_404(
+        Post.objects.only('pk', 'comments_count'), id=post_id
+    )
+    as_json = request.GET.get('format') == 'json'
+    if 'thread' in request.GET:
+        if not request.GET['thread'].isdigit():
+            raise Http404
+        root = get_object_or_404(
+            Comment.objects.only('pk', 'post_id', 'path'),
+            post=post, pk=request.GET['thread'],
+        )
+        replies = list(threads.subtree(
+            root, request.GET.get('after_path')
+        )[:settings.COUNT_COMMENTS + 1])
+        more_url = None
+        if len(replies) > settings.COUNT_COMMENTS:
+            replies = replies[:settings.COUNT_COMMENTS]
+            query = QueryDict(mutable=True)
+            if as_json:
+                query['format'] = 'json'
+            query['thread'] = root.pk
+            query['after_path'] = replies[-1].path
+            more_url = (
+                f'{reverse("posts:comments", args=(post_id,))}'
+                f'?{query.urlencode(safe="/")}'
+            )
+        if as_json:
+            return JsonResponse({
+                'comments': [comment_json(reply) for reply in replies],
+                'next': more_url,
+            })
+        return render(
+            request, 'includes/replies.html',
+            {'replies': replies, 'more_url': more_url},
+        )
+    comments = get_comments(post, request.GET.get('after'))
+    if not as_json:
+        context = {'detail': post, 'comments': comments}
+        return render(request, 'includes/comments.html', context)
+    next_url = None
+    if comments.has_next():
+        next_url = (
+            f'{reverse("posts:comments", args=(post_id,))}'
+            f'?format=json&after={comments.next_cursor}'
+        )
+    return JsonResponse({
+        'comments': [
+            {
+                **comment_json(comment),
+                'replies': [comment_json(reply) for reply in comment.thread],
+                'more_replies': comment.more_replies,
+            }
+            for comment in comments
+        ],
+        'next': next_url,
+    })
+
+
+def post_search(request):
+    template = 'posts/search.html'
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid() and to_match(form.cleaned_data['q']):
+        group = form.cleaned_data['group']
+        page_obj = get_page(
+            request,
+            Search(
+                to_match(form.cleaned_data['q']),
+                group.pk if group else None,
+                form.cleaned_data['author'],
+            ),
+            paginator_class=SearchPaginator,
+            keep=('q', 'group', 'author'),
+        )
+    context = {
+        'title': 'Поиск',
+        'form': form,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
+def export_response(request, posts, name):
+    """Посты и комментарии потоком, в формате из ?format=."""
+    file_format = request.GET.get('format', 'jsonl')
+    if file_format not in export.FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+    serialize, content_type = export.FORMATS[file_format]
+    response = StreamingHttpResponse(
+        serialize(export.records(posts)), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}.{file_format}"'
+    )
+    return response
+
+
+@login_required
+def profile_export(request, username):
+    profile = get_object_or_404(User, username=username)
+    if request.user != profile and not request.user.is_staff:
+        raise PermissionDenied
+    return export_response(request, profile.posts.all(), profile.username)
+
+
+@login_required
+def group_export(request, slug):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(request, group.posts.all(), f'group-{slug}')
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -89,6 +270,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('posts:profile', post.author)
     context = {
         'form': form,
@@ -112,7 +294,9 @@ def post_edit(request, post_id):
         is_edit=True
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -124,7 +308,7 @@ def post_edit(request, post_id):
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    form = CommentForm(request.POST or None)
+    form = CommentForm(request.POST or None, post=post)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
@@ -136,10 +320,11 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(
-        author__following__user=request.user)
-    page_number = request.GET.get('page')
-    page_obj = get_page(page_number, posts)
+    page_obj = get_page(
+        request,
+        feed.sources(request.user),
+        paginator_class=MergedCursorPaginator,
+    )
     context = {
         'page_obj': page_obj
     }
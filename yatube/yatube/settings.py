@@ -48,6 +48,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
@@ -100,6 +101,26 @@ DATABASES = {
     }
 }
 
+# PRAGMA для каждого нового соединения с SQLite (core.sqlite).
+SQLITE_PRAGMAS = {}
+
+# Боевой режим SQLite (YATUBE_SQLITE_PRODUCTION=1): WAL, в котором
+# читатели не ждут писателя, synchronous=NORMAL (fsync только на
+# контрольных точках WAL), файл базы через mmap, 64 МБ страничного
+# кэша, ожидание блокировки до 5 с вместо мгновенной ошибки и
+# соединения, живущие между запросами.
+SQLITE_PRODUCTION: bool = os.environ.get('YATUBE_SQLITE_PRODUCTION') == '1'
+
+if SQLITE_PRODUCTION:
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'busy_timeout': 5000,
+    }
+    DATABASES['default']['CONN_MAX_AGE'] = 60 * 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -143,6 +164,27 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 COUNT_POST: int = 10
 
+# Постов на странице JSON API (/api/v1/).
+API_PAGE_SIZE: int = 20
+
+# Выгрузка постов читает базу пачками по столько строк.
+EXPORT_CHUNK_SIZE: int = 500
+
+# Комментарии под постом показываются и подгружаются пачками, у каждой
+# ветки сразу видно COUNT_REPLIES первых ответов. Ответить можно не
+# глубже COMMENT_MAX_DEPTH уровней.
+COUNT_COMMENTS: int = 20
+COUNT_REPLIES: int = 3
+COMMENT_MAX_DEPTH: int = 10
+
+# Посты авторов с таким числом подписчиков не раскладываются по лентам
+# при публикации, а собираются при чтении /follow/. Обратно к раскладке
+# автор возвращается, только опустившись ниже FEED_PUSH_THRESHOLD, и не
+# в запросе, а командой manage.py push_feeds: ей нужно разложить все его
+# посты оставшимся подписчикам.
+FEED_PULL_THRESHOLD: int = 10000
+FEED_PUSH_THRESHOLD: int = 9000
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
@@ -155,8 +197,96 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+# Фрагменты лент сбрасываются сигналами при изменении постов, поэтому
+# при общем кэше (SHARED_CACHE ниже) их можно хранить долго. Столько же
+# живут и сами версии.
+FEED_CACHE_TIMEOUT: int = 60 * 60 * 6
+
+# Постов в лентах RSS и Atom.
+FEED_SIZE: int = 20
+
+# Карточка поста: базовый размер, ширины для srcset и форматы для
+# <picture> в порядке предпочтения; последний — запасной для <img>.
+# Форматы, которые не умеет сохранять установленный Pillow, пропускаются.
+THUMBNAIL_CARD_SIZE = (960, 339)
+THUMBNAIL_CARD_WIDTHS = (480, 960, 1440)
+THUMBNAIL_CARD_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+
+# Миниатюры постов: имя -> (геометрия, опции sorl-thumbnail). Все они
+# готовятся в фоне сразу после загрузки картинки, шаблоны только читают
+# готовые. THUMBNAIL_WORKERS = 0 — готовить синхронно, в самом запросе.
+THUMBNAIL_GEOMETRIES = {
+    f'card-{width}-{image_format.lower()}': (
+        f'{width}x{width * THUMBNAIL_CARD_SIZE[1] // THUMBNAIL_CARD_SIZE[0]}',
+        {'crop': 'center', 'upscale': True, 'format': image_format},
+    )
+    for image_format in THUMBNAIL_CARD_FORMATS
+    for width in THUMBNAIL_CARD_WIDTHS
 }
+THUMBNAIL_WORKERS: int = 2
+THUMBNAIL_QUEUE_SIZE: int = 100
+# Сколько секунд помнить, что миниатюры ещё нет: её может приготовить
+# другой процесс, и его запись в кэше этого процесса не видна.
+THUMBNAIL_MISS_TIMEOUT: int = 5
+
+# Загрузка картинок постов: картинки больше IMAGE_UPLOAD_MAX_PIXELS по
+# заголовку отклоняются, длинная сторона уменьшается до
+# IMAGE_UPLOAD_MAX_DIMENSION, а на декодирование в воркере уходит не
+# больше IMAGE_UPLOAD_MEMORY_LIMIT байт.
+IMAGE_UPLOAD_MAX_PIXELS: int = 100_000_000
+IMAGE_UPLOAD_MAX_DIMENSION: int = 2560
+IMAGE_UPLOAD_MEMORY_LIMIT: int = 64 * 1024 * 1024
+IMAGE_UPLOAD_QUALITY: int = 90
+
+# Сборщик мусора в MEDIA_ROOT (manage.py gc_media) не трогает файлы
+# моложе MEDIA_GC_MIN_AGE секунд и хранит курсор обхода в файле
+# MEDIA_GC_STATE внутри MEDIA_ROOT.
+MEDIA_GC_MIN_AGE: int = 60 * 60
+MEDIA_GC_STATE = '.gc_media'
+
+# Число строк в списках админки считается не чаще раза в столько секунд:
+# на миллионах записей точный COUNT(*) на каждый клик слишком дорог.
+ADMIN_COUNT_TIMEOUT: int = 60 * 5
+
+# Общий для всех воркеров и команд manage.py кэш: путь к SQLite-файлу
+# для одной машины или memcached://host:port для нескольких. Перед ним
+# в каждом процессе работает небольшой LRU (core.cache_backends.
+# TieredCache). Версии фрагментов лежат в нём же, поэтому сброс, сделанный
+# одним процессом, видят все. Пустое значение — кэш только в памяти
+# процесса: чужой сброс процесс не заметит, пока не истекут его копии,
+# поэтому FEED_CACHE_TIMEOUT сокращается до минуты.
+SHARED_CACHE = os.environ.get(
+    'YATUBE_SHARED_CACHE', os.path.join(BASE_DIR, 'cache.sqlite3')
+)
+
+# Тесты подменяют общий кэш пустым временным файлом.
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+if not SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    FEED_CACHE_TIMEOUT = 60
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.TieredCache',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'LOCAL_MAX_ENTRIES': 1000,
+                'LOCAL_TIMEOUT': 5,
+            },
+        },
+        'shared': {
+            'BACKEND': 'core.cache_backends.SQLiteCache',
+            'LOCATION': SHARED_CACHE,
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
+    }
+    if SHARED_CACHE.startswith('memcached://'):
+        CACHES['shared'] = {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': SHARED_CACHE[len('memcached://'):],
+        }